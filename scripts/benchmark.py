@@ -0,0 +1,435 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+sys.path.append(os.path.realpath(os.path.join(sys.path[0], "..", "src")))
+
+from monitor import ResourceMonitor, ResourceSampler
+from output import OutputBuffer
+from rules import Rules
+from search import compilePattern, LineFilter, SearchIndex, Searcher
+from session import ProcessSession
+
+# Benchmark suite for the output pipeline. Measures the end-to-end throughput of a process session fed by the synthetic output generator, the threads and CPU time used by concurrent sessions with each process backend, the output buffer append latency, the find latency, the filter latency, the output line rules cost, the output memory growth and the CPU time of the resource sampler, and writes the results as JSON.
+
+# Line counts for which the output buffer append cost is measured
+APPEND_LINE_COUNTS = [1000, 10000, 100000, 1000000]
+
+# Output sizes in lines for which the find latency is measured
+FIND_LINE_COUNTS = [10000, 100000, 1000000]
+
+# Process backends compared by the sessions benchmark
+BACKENDS = ["threads", "asyncio"]
+
+# Text contained in the lines matching the rules
+HIT_TEXT = "ERROR"
+
+# Settings used for the benchmarked process sessions and rules
+SETTINGS = {
+    "outputEncoding": "utf-8",
+    "decodeErrors": "replace",
+    "maxLineLength": 10000,
+    "scrollbackLimit": 2000000,
+    "processBackend": "auto",
+    "processTimeout": 0,
+    "terminateGracePeriod": 5,
+    "backpressurePolicy": "spill",
+    "outputQueueBytes": 8388608,
+    "monitorInterval": 1,
+    "monitorSamples": 3600,
+    "logOutput": False,
+    "logDirectory": "",
+    "logMaxBytes": 10485760,
+    "logMaxSeconds": 0,
+    "logCompression": "gzip",
+    "separateStderr": True,
+    "playSuccessSound": True,
+    "successRegex": "BUILD SUCCESS",
+    "playErrorSound": True,
+    "errorRegex": HIT_TEXT,
+    "lineSubstitution": True,
+    "substitutionRegex": r"^\[\d\d:\d\d:\d\d\] ",
+    "substitutionReplacement": "",
+}
+
+# Number of child processes of every process tree sampled by the monitor benchmark
+MONITOR_CHILD_COUNT = 2
+
+# Returns a list of the given number of synthetic output lines of the given length, of which the given ratio contains the hit text.
+def makeLines(count, length, hitRatio, seed=0):
+    generator = random.Random(seed)
+    lines = []
+    for i in range(count):
+        prefix = "[12:34:56] "
+        if generator.random() < hitRatio:
+            prefix += HIT_TEXT + " "
+        text = prefix + "line {} ".format(i)
+        lines.append((text + "x" * max(length - len(text), 0)) + "\n")
+    return lines
+
+
+# Writes synthetic output lines to the standard output. Lines are written in bursts of the given size at the given rate in lines per second, or as fast as possible if the rate is 0.
+def generate(args):
+    lines = makeLines(args.lines, args.line_length, args.hit_ratio)
+    out = sys.stdout.buffer
+    interval = args.burst / args.rate if args.rate > 0 else 0
+    nextTime = time.perf_counter()
+    for start in range(0, len(lines), args.burst):
+        out.write("".join(lines[start : start + args.burst]).encode("utf-8"))
+        out.flush()
+        if interval:
+            nextTime += interval
+            delay = nextTime - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+
+# Returns the given list of durations in seconds summarized as percentiles in microseconds.
+def summarize(durations):
+    durations = sorted(durations)
+    count = len(durations)
+    return {
+        "count": count,
+        "meanUs": sum(durations) / count * 1000000,
+        "p50Us": durations[count // 2] * 1000000,
+        "p99Us": durations[min(count * 99 // 100, count - 1)] * 1000000,
+        "maxUs": durations[-1] * 1000000,
+    }
+
+
+# Returns the command running the synthetic output generator with the given arguments.
+def makeGeneratorCommand(args, lines):
+    return [
+        sys.executable,
+        os.path.realpath(__file__),
+        "generate",
+        "--lines",
+        str(lines),
+        "--line-length",
+        str(args.line_length),
+        "--rate",
+        str(args.rate),
+        "--burst",
+        str(args.burst),
+        "--hit-ratio",
+        str(args.hit_ratio),
+    ]
+
+
+# Runs the synthetic output generator in the given number of concurrent process sessions using the given process backend, each producing the given number of lines. Returns the line and hit counts, the output length, the elapsed and CPU time, the time to the first line, and the peak number of threads of this process.
+def runSessions(args, backend, sessionCount, lines):
+    settings = dict(SETTINGS, processBackend=backend)
+    ended = threading.Semaphore(0)
+    lock = threading.Lock()
+    counts = {"lines": 0, "hits": 0, "peakThreads": threading.active_count()}
+    firstLineTime = []
+
+    # Count the lines as a subscribed UI would and sample the thread count
+    def onLine(line, isSuccess, isError, isStderr):
+        with lock:
+            if not firstLineTime:
+                firstLineTime.append(time.perf_counter())
+            counts["lines"] += 1
+            if isError:
+                counts["hits"] += 1
+            if counts["lines"] % 1000 == 0:
+                counts["peakThreads"] = max(
+                    counts["peakThreads"], threading.active_count()
+                )
+
+    sessions = []
+    start = time.perf_counter()
+    cpuStart = time.process_time()
+    for i in range(sessionCount):
+        session = ProcessSession(settings, Rules(settings))
+        session.subscribe("line", onLine)
+        session.subscribe("end", lambda returnCode: ended.release())
+        session.start(makeGeneratorCommand(args, lines), None, False)
+        sessions.append(session)
+    counts["peakThreads"] = max(counts["peakThreads"], threading.active_count())
+    for session in sessions:
+        ended.acquire()
+    counts["seconds"] = time.perf_counter() - start
+    counts["firstLineSeconds"] = firstLineTime[0] - start if firstLineTime else None
+    counts["cpuSeconds"] = time.process_time() - cpuStart
+    counts["bytes"] = sum(session.output.getLength() for session in sessions)
+    return counts
+
+
+# Runs the synthetic output generator in a process session and returns the end-to-end throughput.
+def benchmarkThroughput(args):
+    counts = runSessions(args, args.backend, 1, args.lines)
+    elapsed = counts["seconds"]
+    return {
+        "backend": args.backend,
+        "lines": counts["lines"],
+        "hits": counts["hits"],
+        "lineLength": args.line_length,
+        "rate": args.rate,
+        "burst": args.burst,
+        "hitRatio": args.hit_ratio,
+        "seconds": elapsed,
+        "firstLineMs": counts["firstLineSeconds"] * 1000
+        if counts["firstLineSeconds"] is not None
+        else None,
+        "cpuSeconds": counts["cpuSeconds"],
+        "peakThreads": counts["peakThreads"],
+        "linesPerSecond": counts["lines"] / elapsed,
+        "bytesPerSecond": counts["bytes"] / elapsed,
+    }
+
+
+# Runs the sessions benchmark with the given process backend and the given number of lines per session in a new interpreter, so that the shared threads started by one backend are not counted for the other, and returns the results of runSessions.
+def runSessionsProcess(args, backend, lines):
+    command = makeGeneratorCommand(args, lines)
+    command[2] = "sessions"
+    command += ["--backend", backend, "--sessions", str(args.sessions)]
+    result = subprocess.run(command, stdout=subprocess.PIPE, check=True)
+    return json.loads(result.stdout)
+
+
+# Runs the synthetic output generator in concurrent process sessions with every process backend and returns the threads and CPU time used.
+def benchmarkSessions(args):
+    results = []
+    lines = max(args.lines // args.sessions, 1)
+    for backend in BACKENDS:
+        counts = runSessionsProcess(args, backend, lines)
+        results.append(
+            {
+                "backend": backend,
+                "sessions": args.sessions,
+                "lines": counts["lines"],
+                "seconds": counts["seconds"],
+                "cpuSeconds": counts["cpuSeconds"],
+                "peakThreads": counts["peakThreads"],
+                "linesPerSecond": counts["lines"] / counts["seconds"],
+            }
+        )
+    return results
+
+
+# Returns the output buffer append cost and latency percentiles for every line count.
+def benchmarkAppend(args):
+    results = []
+    line = makeLines(1, args.line_length, 0)[0]
+    for lineCount in APPEND_LINE_COUNTS:
+        buffer = OutputBuffer()
+        start = time.perf_counter()
+        for i in range(lineCount):
+            buffer.append(line)
+        elapsed = time.perf_counter() - start
+
+        # Measure the latency of every single append to another buffer of the same size
+        buffer = OutputBuffer()
+        durations = []
+        for i in range(lineCount):
+            appendStart = time.perf_counter()
+            buffer.append(line)
+            durations.append(time.perf_counter() - appendStart)
+        result = {"lines": lineCount, "usPerLine": elapsed / lineCount * 1000000}
+        result["latency"] = summarize(durations)
+        results.append(result)
+    return results
+
+
+# Returns the latency of finding a text at the end of the output for every output size.
+def benchmarkFind(args):
+    results = []
+    for lineCount in FIND_LINE_COUNTS:
+        buffer = OutputBuffer(memoryLimit=SETTINGS["scrollbackLimit"])
+        search = SearchIndex(buffer)
+        for line in makeLines(lineCount, args.line_length, 0):
+            buffer.append(line)
+            search.append(line)
+        buffer.append("needle\n")
+        search.append("needle\n")
+
+        # Find the last line forward from the beginning
+        result = {"lines": lineCount}
+        start = time.perf_counter()
+        search.find("NEEDLE", 0, True)
+        result["literalMs"] = (time.perf_counter() - start) * 1000
+
+        # Find the first line backward from the end
+        start = time.perf_counter()
+        search.rfind("line 0 ", buffer.getLength(), False)
+        result["literalBackwardMs"] = (time.perf_counter() - start) * 1000
+
+        # Find the regular expression in the searcher worker thread
+        searcher = Searcher(buffer)
+        done = threading.Event()
+        pattern = compilePattern("need+le", True, True)
+        start = time.perf_counter()
+        searcher.findNext(pattern, 0, False, buffer.getLength(), lambda *args: done.set())
+        done.wait()
+        result["regexMs"] = (time.perf_counter() - start) * 1000
+        results.append(result)
+    return results
+
+
+# Returns the time of filtering the whole output by a regular expression for every output size, which is the cost of turning a new filter on.
+def benchmarkFilter(args):
+    results = []
+    for lineCount in FIND_LINE_COUNTS:
+        buffer = OutputBuffer(memoryLimit=SETTINGS["scrollbackLimit"])
+        for line in makeLines(lineCount, args.line_length, args.hit_ratio):
+            buffer.append(line)
+        result = {"lines": lineCount}
+        for name, text, useRegex in [
+            ("literal", HIT_TEXT.lower(), False),
+            ("regex", "warning|" + HIT_TEXT, True),
+        ]:
+            lineFilter = LineFilter(buffer, text, useRegex, True)
+            start = time.perf_counter()
+            lineFilter.update(buffer.getLength())
+            result[name + "Ms"] = (time.perf_counter() - start) * 1000
+        result["matchingLines"] = lineFilter.getCount()
+        results.append(result)
+    return results
+
+
+# Returns the cost of applying the output line rules to a line.
+def benchmarkRules(args):
+    rules = Rules(SETTINGS)
+    lines = makeLines(100000, args.line_length, args.hit_ratio)
+    start = time.perf_counter()
+    for line in lines:
+        line = rules.substitute(line)
+        rules.isSuccess(line)
+        rules.isError(line)
+    elapsed = time.perf_counter() - start
+    return {"lines": len(lines), "usPerLine": elapsed / len(lines) * 1000000}
+
+
+# Returns the memory allocated by the output buffer and the search index after appending increasing numbers of lines.
+def benchmarkMemory(args):
+    results = []
+    line = makeLines(1, args.line_length, 0)[0]
+    tracemalloc.start()
+    buffer = OutputBuffer(memoryLimit=SETTINGS["scrollbackLimit"])
+    search = SearchIndex(buffer, memoryLimit=SETTINGS["scrollbackLimit"])
+    lineCount = 0
+    for target in FIND_LINE_COUNTS:
+        while lineCount < target:
+            buffer.append(line)
+            search.append(line)
+            lineCount += 1
+        current, peak = tracemalloc.get_traced_memory()
+        results.append(
+            {"lines": lineCount, "currentBytes": current, "peakBytes": peak}
+        )
+    tracemalloc.stop()
+    return results
+
+
+# Samples the given number of idle process trees with resource monitors at the "monitorInterval" setting for the given number of seconds and returns the CPU time spent by the shared resource sampler thread, also as the percentage of one CPU core.
+def benchmarkMonitor(args):
+    import psutil
+
+    code = (
+        "import subprocess, sys, time\n"
+        "children = [subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(3600)']) for i in range({})]\n"
+        "time.sleep(3600)\n"
+    ).format(MONITOR_CHILD_COUNT)
+    processes = [
+        subprocess.Popen([sys.executable, "-c", code]) for i in range(args.sessions)
+    ]
+    time.sleep(1)  # Let the child processes start
+    monitors = []
+    try:
+        sampler = ResourceSampler.shared()
+        cpuStart = sampler.getCpuSeconds()
+        start = time.perf_counter()
+        for process in processes:
+            monitor = ResourceMonitor(SETTINGS["monitorInterval"], SETTINGS["monitorSamples"])
+            monitor.start(process.pid)
+            monitors.append(monitor)
+        time.sleep(args.monitor_seconds)
+        elapsed = time.perf_counter() - start
+        cpuSeconds = sampler.getCpuSeconds() - cpuStart
+        samples = sum(len(monitor.getSamples()) for monitor in monitors)
+    finally:
+        for monitor in monitors:
+            monitor.stop()
+        for process in processes:
+            for child in psutil.Process(process.pid).children(recursive=True):
+                child.kill()
+            process.kill()
+            process.wait()
+    return {
+        "trees": args.sessions,
+        "processesPerTree": MONITOR_CHILD_COUNT + 1,
+        "interval": SETTINGS["monitorInterval"],
+        "seconds": elapsed,
+        "samples": samples,
+        "samplerCpuSeconds": cpuSeconds,
+        "samplerCpuPercent": cpuSeconds / elapsed * 100,
+        "usPerSample": cpuSeconds / max(samples, 1) * 1000000,
+    }
+
+
+# Benchmarks by name
+BENCHMARKS = {
+    "throughput": benchmarkThroughput,
+    "sessions": benchmarkSessions,
+    "append": benchmarkAppend,
+    "find": benchmarkFind,
+    "filter": benchmarkFilter,
+    "rules": benchmarkRules,
+    "memory": benchmarkMemory,
+    "monitor": benchmarkMonitor,
+}
+
+
+# Runs the selected benchmarks and writes the results as JSON.
+def run(args):
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "benchmarks": {},
+    }
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    for name in names:
+        print("Running {}...".format(name), file=sys.stderr)
+        results["benchmarks"][name] = BENCHMARKS[name](args)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text)
+    else:
+        print(text)
+
+
+# Main function.
+def main():
+    parser = argparse.ArgumentParser(description="AccessibleRunner output pipeline benchmark")
+    parser.add_argument("mode", nargs="?", choices=["run", "generate", "sessions"], default="run")
+    parser.add_argument("--lines", type=int, default=200000)
+    parser.add_argument("--line-length", type=int, default=80)
+    parser.add_argument("--rate", type=float, default=0, help="lines per second, 0 for unlimited")
+    parser.add_argument("--burst", type=int, default=100, help="lines written at once")
+    parser.add_argument("--hit-ratio", type=float, default=0.01)
+    parser.add_argument("--backend", choices=BACKENDS, default="threads")
+    parser.add_argument("--sessions", type=int, default=10, help="concurrent sessions")
+    parser.add_argument("--monitor-seconds", type=float, default=10, help="duration of the monitor benchmark")
+    parser.add_argument("--only", help="comma separated benchmark names")
+    parser.add_argument("--output", help="path of the JSON results file")
+    args = parser.parse_args()
+    if args.mode == "generate":
+        generate(args)
+    elif args.mode == "sessions":
+        print(json.dumps(runSessions(args, args.backend, args.sessions, args.lines)))
+    else:
+        run(args)
+
+
+main()
@@ -1,5 +1,10 @@
 python setup-cx_Freeze.py build
 
+rem Convert the help page to HTML, so that it is not converted when the help is shown
+pushd ..\src
+python helppage.py
+popd
+
 xcopy ..\src\sounds ..\build\cx_Freeze\AccessibleRunner\sounds\
 xcopy ..\src\md ..\build\cx_Freeze\AccessibleRunner\md\
 xcopy ..\src\config.default.json ..\build\cx_Freeze\AccessibleRunner
@@ -1,35 +1,43 @@
-import accessible_output2.outputs.auto
+import time
+
+# Time of the application start, measured before the other modules are imported
+START_TIME = time.perf_counter()
+
+import json
 import os
-from playsound import playsound
-import psutil
-import re
-from subprocess import call, Popen, PIPE, STDOUT
 import sys
-from threading import Thread
 import wx
 
+from announcer import Announcer
 from config import Config
 from gui import MainFrame
-
-ON_WINDOWS = os.name == "nt"
+from history import History
+from monitor import formatBytes
+from rules import Rules
+from session import ProcessSession, resolveEncoding, setConsoleCodePage
+from sound import SoundPlayer
+from stats import PipelineStats
 
 # Main application class.
 class AccessibleRunner:
 
     # Maximum number of items in the commands history.
-    COMMANDS_HISTORY_LIMIT = 10
+    COMMANDS_HISTORY_LIMIT = 5000
 
     # Maximum number of items in the working directories history.
-    DIRECTORIES_HISTORY_LIMIT = 10
+    DIRECTORIES_HISTORY_LIMIT = 5000
 
     # Maximum number of items in the find texts history
-    FIND_TEXTS_HISTORY_LIMIT = 10
+    FIND_TEXTS_HISTORY_LIMIT = 1000
 
     # Maximum number of items in the line substitution regular expression history
-    SUBSTITUTION_REGEXES_HISTORY_LIMIT = 10
+    SUBSTITUTION_REGEXES_HISTORY_LIMIT = 1000
 
     # Maximum number of items in the line substitution replacement history
-    SUBSTITUTION_REPLACEMENTS_HISTORY_LIMIT = 10
+    SUBSTITUTION_REPLACEMENTS_HISTORY_LIMIT = 1000
+
+    # Number of the best ranked history items offered as the combobox choices and completions.
+    HISTORY_CHOICES_COUNT = 20
 
     # Paths to sounds directory and files
     SOUNDS_PATH = "sounds/"
@@ -41,21 +49,108 @@ class AccessibleRunner:
     def __init__(self, config):
         self.config = config
         self.active = True
-        self.process = None
-        self.sr = accessible_output2.outputs.auto.Auto()
+        self.ui = None
+        self.histories = {
+            "commands": History(
+                config.history["commands"], AccessibleRunner.COMMANDS_HISTORY_LIMIT
+            ),
+            "directories": History(
+                config.history["directories"],
+                AccessibleRunner.DIRECTORIES_HISTORY_LIMIT,
+            ),
+            "findTexts": History(
+                config.history["findTexts"], AccessibleRunner.FIND_TEXTS_HISTORY_LIMIT
+            ),
+            "substitutionRegexes": History(
+                config.history["substitutionRegexes"],
+                AccessibleRunner.SUBSTITUTION_REGEXES_HISTORY_LIMIT,
+            ),
+            "substitutionReplacements": History(
+                config.history["substitutionReplacements"],
+                AccessibleRunner.SUBSTITUTION_REPLACEMENTS_HISTORY_LIMIT,
+            ),
+        }
+        setConsoleCodePage(config.settings["consoleCodePage"])
+        self.sessions = []
+        self.session = self.createSession()
+        self.sounds = SoundPlayer()
+        self.sounds.addSound(
+            "success",
+            AccessibleRunner.SUCCESS_SOUND_PATH,
+            config.settings["soundCooldown"],
+        )
+        self.sounds.addSound(
+            "error", AccessibleRunner.ERROR_SOUND_PATH, config.settings["soundCooldown"]
+        )
+        self.sounds.addSound("notFound", AccessibleRunner.NOT_FOUND_SOUND_PATH)
+        self.sr = None
+        self.lastPipelineStats = None
+        self.announcer = Announcer(
+            self.srOutput,
+            config.settings["srMaxAnnouncementsPerSecond"],
+            config.settings["srMaxLineAge"],
+        )
 
     # Sets the UI object for this runner.
     def setUI(self, ui):
         self.ui = ui
 
+    # Creates a new process session with its own output line rules compiled from the current settings, adds it to the sessions list and returns it.
+    def createSession(self):
+        session = ProcessSession(
+            self.config.settings,
+            Rules(self.config.settings, strict=False),
+            logDirectory=Config.APPDATA_LOGS_PATH,
+        )
+        session.subscribe(
+            "line",
+            lambda line, isSuccess, isError, isStderr: self.onSessionLine(
+                session, line, isSuccess, isError, isStderr
+            ),
+        )
+        session.subscribe(
+            "terminate",
+            lambda stage, count: wx.CallAfter(
+                self.onSessionTerminate, session, stage, count
+            ),
+        )
+        session.subscribe(
+            "error", lambda error: wx.CallAfter(self.onSessionError, session, error)
+        )
+        self.sessions.append(session)
+        if self.ui is not None:
+            self.ui.addSession(session)
+        return session
+
+    # Makes the given session the active one, i.e., the one shown in the UI and controlled by the run and kill commands.
+    def selectSession(self, session):
+        self.session = session
+        self.ui.showSession(session)
+
+    # Makes the session after the active one active, or the one before it if previous is True.
+    def selectNextSession(self, previous=False):
+        index = self.sessions.index(self.session)
+        index = (index + (-1 if previous else 1)) % len(self.sessions)
+        self.selectSession(self.sessions[index])
+
+    # Closes the active session if its process is not running and it is not the only session.
+    def closeSession(self):
+        if self.session.isRunning() or len(self.sessions) == 1:
+            return False
+        index = self.sessions.index(self.session)
+        self.sessions.pop(index)
+        self.ui.removeSession(self.session)
+        self.selectSession(self.sessions[min(index, len(self.sessions) - 1)])
+        return True
+
     # Sets the active state of the application to the given value.
     def setActive(self, active):
         self.active = active
 
-    # Runs the given command in a new process starting in  the  given working directory . The "useShell" parameter indicates if the command should be executed through the shell.
+    # Runs the given command in a new process starting in  the  given working directory . The "useShell" parameter indicates if the command should be executed through the shell. If the process of the active session is running, the command is run in a new session.
     def runProcess(self, command, directory, useShell):
-        if self.process is not None:
-            return
+        if self.session.isRunning():
+            self.selectSession(self.createSession())
 
         # Add the command and directory to the history and ensure that blank or whitespace working directory value means the current working directory should be used
         self.addToCommandsHistory(command)
@@ -63,109 +158,105 @@ class AccessibleRunner:
             directory = None
         self.addToDirectoriesHistory(directory)
 
-        # On Windows, set the proper code page for console
-        # See https://stackoverflow.com/questions/67524114/python-how-to-decode-file-names-retrieved-from-dir-command-using-subprocess
-        if ON_WINDOWS:
-            call(["chcp", "65001"], shell=True)
-
-            # Try running the command
+        # Try running the command
         try:
-            self.process = Popen(
-                command,
-                cwd=directory,
-                shell=useShell,
-                stdout=PIPE,
-                stderr=STDOUT,
-                stdin=PIPE,
-            )
+            self.session.start(command, directory, useShell, self.getEncoding(command))
         except (NotADirectoryError, FileNotFoundError):
-            errorMessage = "Error: The working directory '{}' does not exist.\n".format(
-                directory
+            self.showRunError(
+                "Error: The working directory '{}' does not exist.\n".format(directory)
             )
-            self.ui.setOutput(errorMessage, True)
-            self.srOutput(errorMessage)
-            self.ui.setAsNotRunning()
+        except LookupError as e:
+            self.showRunError("Error: Unknown output encoding: {}.\n".format(e))
         else:
-
-            # Start fetching the process output in a new thread
-            thread = Thread(target=self.fetchOutput, args=(self.process.stdout, None))
-            thread.daemon = True  # Thread dies with the program
-            thread.start()
             self.ui.setAsRunning()
 
-    # Cleans everything on exit, including saving the changes to the config file.
+    # Shows and outputs via screen reader the given error message of running a process.
+    def showRunError(self, errorMessage):
+        self.ui.setOutput(errorMessage, True)
+        self.srOutput(errorMessage)
+        self.ui.setAsNotRunning()
+
+    # Returns the output encoding of the given command, which is the one set for the command in the "commandEncodings" setting, or None if the global encoding should be used.
+    def getEncoding(self, command):
+        return self.config.settings["commandEncodings"].get(command.strip())
+
+    # Checks the output encoding in the given settings. Raises LookupError if the encoding is unknown.
+    def validateEncoding(self, settings):
+        resolveEncoding(settings["outputEncoding"])
+
+    # Cleans everything on exit, including killing the processes of all the sessions and saving the changes to the config file.
     def clean(self):
-        self.killProcessTree()
+        for session in self.sessions:
+            session.kill()
+        for record, history in self.histories.items():
+            self.config.history[record] = history.toList()
         self.config.saveToFile()
 
-    # Adds the given item to the  given history record with the given limit and returns the new items list.
-    def addToHistory(self, item, record, limit):
-        if (item.strip() == "") or item is None:
+    # Adds a use of the given item to the given history record. Blank items are not added.
+    def addToHistory(self, item, record):
+        if item is None or item.strip() == "":
             return
-        items = self.config.history[record]
-
-        # If the item already exists in the history, remove it
-        try:
-            index = items.index(item)
-            items.pop(index)
-        except:
-            pass
+        self.histories[record].add(item)
 
-        # Add the item to the begining of the history
-        items.insert(0, item)
+    # Returns the best ranked items of the given history record to be offered as the combobox choices.
+    def getHistoryChoices(self, record):
+        return self.histories[record].getItems(AccessibleRunner.HISTORY_CHOICES_COUNT)
 
-        # Remove the items which exceed the history limit
-        items = items[:limit]
-
-        return items
+    # Returns the best ranked items of the given history record starting with the given prefix.
+    def completeFromHistory(self, record, prefix):
+        return self.histories[record].complete(
+            prefix, AccessibleRunner.HISTORY_CHOICES_COUNT
+        )
 
     # Adds the given command to the  history.
     def addToCommandsHistory(self, command):
-        commands = self.addToHistory(
-            command, "commands", AccessibleRunner.COMMANDS_HISTORY_LIMIT
-        )
+        self.addToHistory(command, "commands")
 
         # Set the new command choices
-        self.ui.setCommandChoices(commands)
+        self.ui.setCommandChoices(self.getHistoryChoices("commands"))
 
     # Adds the given directory to the  history.
     def addToDirectoriesHistory(self, directory):
         if directory is None:
             return
-        directories = self.addToHistory(
-            os.path.normpath(directory),
-            "directories",
-            AccessibleRunner.DIRECTORIES_HISTORY_LIMIT,
-        )
+        self.addToHistory(os.path.normpath(directory), "directories")
 
         # Set the new directory choices
-        self.ui.setDirectoryChoices(directories)
+        self.ui.setDirectoryChoices(self.getHistoryChoices("directories"))
 
     # Adds the given find text to the  history.
     def addToFindTextsHistory(self, findText):
-        self.addToHistory(
-            findText, "findTexts", AccessibleRunner.FIND_TEXTS_HISTORY_LIMIT
-        )
+        self.addToHistory(findText, "findTexts")
 
     # Adds the given line substitution regular expression to the  history.
     def addToSubstitutionRegexesHistory(self, regex):
-        self.addToHistory(
-            regex,
-            "substitutionRegexes",
-            AccessibleRunner.SUBSTITUTION_REGEXES_HISTORY_LIMIT,
-        )
+        self.addToHistory(regex, "substitutionRegexes")
 
-    # Merges the given settings with the config settings dictionary.
+    # Merges the given settings with the config settings dictionary. If the output line rules settings change, the rules are compiled again and swapped for the ones of the active session. The other sessions keep their own rules, while the new sessions get the changed ones. The scrollback limit is applied to the output buffers and search indexes of all the sessions.
     def mergeSettings(self, settings):
+        rulesChanged = Rules.areChanged(settings, self.config.settings)
         self.config.settings.update(settings)
+        if rulesChanged:
+            self.session.setRules(Rules(self.config.settings, strict=False))
+        scrollbackLimit = self.config.settings["scrollbackLimit"]
+        for session in self.sessions:
+            session.output.setMemoryLimit(scrollbackLimit)
+        if self.ui is not None:
+            self.ui.setMemoryLimit(scrollbackLimit)
+        self.sounds.setCooldown("success", self.config.settings["soundCooldown"])
+        self.sounds.setCooldown("error", self.config.settings["soundCooldown"])
+        self.announcer.setLimits(
+            self.config.settings["srMaxAnnouncementsPerSecond"],
+            self.config.settings["srMaxLineAge"],
+        )
+
+    # Checks the output line rules in the given settings merged with the config settings dictionary. Raises InvalidRuleError if any of the regular expressions or the replacement is invalid.
+    def validateRules(self, settings):
+        Rules(dict(self.config.settings, **settings))
 
     # Adds the given line substitution replacement to the  history.
     def addToSubstitutionReplacementsHistory(self, replacement):
-        self.addToHistory(
-            replacement,
-            "substitutionReplacements",
-            AccessibleRunner.SUBSTITUTION_REPLACEMENTS_HISTORY_LIMIT,
-        )
+        self.addToHistory(replacement, "substitutionReplacements")
 
     # Clears the command output.
     def clearOutput(self):
@@ -180,98 +271,200 @@ class AccessibleRunner:
             wx.TheClipboard.SetData(data)
             wx.TheClipboard.Close()
 
-            # Kills the currently running process and all its child processes.
-
+    # Terminates the currently running process and all its child processes in background, or kills them immediately if they are already being terminated. The UI is set as not running when the process ends.
     def killProcessTree(self):
-        if not self.process:
+        if not self.session.isRunning():
             return
+        self.session.terminate()
+        self.announcer.clear()
+
+    # Outputs the latest resource usage figures of the process tree of the active session and their peaks via screen reader.
+    def outputResourceUsage(self):
+        monitor = self.session.monitor
+        latest = monitor.getLatest()
+        if latest is None:
+            self.srOutput("No resource usage measured", True)
+            return
+        peaks = monitor.getPeaks()
+        self.srOutput(
+            "{}CPU {:.0f}%, memory {}, read {}, written {}, {:.0f} threads, {:.0f} child processes. Peak CPU {:.0f}%, memory {}, {:.0f} threads, {:.0f} child processes".format(
+                "" if self.session.isRunning() else "Process ended. Last ",
+                latest["cpu"],
+                formatBytes(latest["rss"]),
+                formatBytes(latest["readBytes"]),
+                formatBytes(latest["writeBytes"]),
+                latest["threads"],
+                latest["children"],
+                peaks["cpu"],
+                formatBytes(peaks["rss"]),
+                peaks["threads"],
+                peaks["children"],
+            ),
+            True,
+        )
 
-        parent = psutil.Process(self.process.pid)
-        children = parent.children(recursive=True)
-        for child in children:
-            child.kill()
-        psutil.wait_procs(children, timeout=5)
-        try:
-            parent.kill()
-            parent.wait(5)
-        except:
-            pass
-        self.process = None
-        self.ui.setAsNotRunning()
+    # Returns the pipeline statistics with the output queue, output textbox and screen reader backlogs of the active session as a dictionary.
+    def getPipelineStats(self):
+        stats = PipelineStats.shared().toDict()
+        outputCharacters, outputSeconds = self.ui.getOutputBacklog()
+        announceLines, announceSeconds = self.announcer.getBacklog()
+        queueBytes, spilledBytes = (
+            self.session.queue.getSize() if self.session.queue else (0, 0)
+        )
+        stats["backlog"] = {
+            "queueBytes": queueBytes,
+            "spilledBytes": spilledBytes,
+            "outputCharacters": outputCharacters,
+            "outputSeconds": outputSeconds,
+            "announceLines": announceLines,
+            "announceSeconds": announceSeconds,
+        }
+        return stats
+
+    # Outputs via screen reader the output rates and the busiest pipeline stage since the last call, and the output textbox and screen reader backlogs. The busiest stage is the one which has taken the largest share of the time, so a share close to 100% means that the stage is the bottleneck.
+    def outputPipelineStats(self):
+        stats = self.getPipelineStats()
+        previous = self.lastPipelineStats
+        self.lastPipelineStats = stats
+
+        # Get the differences of the counters since the last call
+        def getDelta(stage, key):
+            value = stats["stages"][stage][key]
+            return value - previous["stages"][stage][key] if previous else value
+
+        seconds = max(stats["seconds"] - (previous["seconds"] if previous else 0), 0.001)
+        busiest = max(
+            (stage for stage in PipelineStats.STAGES if stage != "read"),
+            key=lambda stage: getDelta(stage, "totalNs"),
+        )
+        busiestUnits = getDelta(busiest, "units")
+        backlog = stats["backlog"]
+        self.srOutput(
+            "{:.0f} lines and {} per second. Busiest stage {}, {:.0f}% of the time, {:.1f} microseconds per {}. Output textbox behind by {} characters, {:.1f} seconds. Speech behind by {} lines, {:.1f} seconds".format(
+                getDelta("match", "units") / seconds,
+                formatBytes(getDelta("read", "units") / seconds),
+                busiest,
+                getDelta(busiest, "totalNs") / 1e7 / seconds,
+                getDelta(busiest, "totalNs") / 1000 / busiestUnits
+                if busiestUnits
+                else 0,
+                PipelineStats.STAGES[busiest][:-1],
+                backlog["outputCharacters"],
+                backlog["outputSeconds"],
+                backlog["announceLines"],
+                backlog["announceSeconds"],
+            ),
+            True,
+        )
 
-    # Plays the sound at the given path asynchronously.
-    def play(self, path):
-        thread = Thread(target=playsound, args=(path, None))
-        thread.daemon = True  # Thread dies with the program
-        thread.start()
+    # Saves the pipeline statistics with the output queue, output textbox and screen reader backlogs to a new JSON file in the application data directory and outputs its path via screen reader.
+    def savePipelineStats(self):
+        path = os.path.join(
+            os.path.dirname(Config.APPDATA_CONFIG_PATH),
+            "pipeline-stats-{}.json".format(time.strftime("%Y%m%d-%H%M%S")),
+        )
+        try:
+            with open(path, "w", encoding="utf-8") as file:
+                json.dump(self.getPipelineStats(), file, indent=2)
+        except OSError as e:
+            self.srOutput("Pipeline statistics not saved: {}".format(e), True)
+            return
+        self.srOutput("Pipeline statistics saved to {}".format(path), True)
 
-    # Plays the success sound.
+    # Plays the success sound asynchronously.
     def playSuccess(self):
-        self.play(AccessibleRunner.SUCCESS_SOUND_PATH)
+        self.sounds.play("success")
 
-    # Plays the error sound.
+    # Plays the error sound asynchronously.
     def playError(self):
-        self.play(AccessibleRunner.ERROR_SOUND_PATH)
+        self.sounds.play("error")
 
-    # Plays the not found sound.
+    # Plays the not found sound asynchronously.
     def playNotFound(self):
-        self.play(AccessibleRunner.NOT_FOUND_SOUND_PATH)
+        self.sounds.play("notFound")
+
+    # Loads the screen reader output module if it has not been loaded yet. The module is loaded after the main window is shown, so that it does not slow down the start.
+    def loadScreenReader(self):
+        if self.sr is None:
+            import accessible_output2.outputs.auto
+
+            self.sr = accessible_output2.outputs.auto.Auto()
 
     # Outputs the given text via screen reader, optionally interrupting the current output.
     def srOutput(self, text, interrupt=False):
+        self.loadScreenReader()
+
         # Output only if screen reader is running
         if not self.sr.is_system_output():
             self.sr.output(text, interrupt=interrupt)
 
-    # Waits for the process output and continuously writes it to the command output. Depending on the current settings, plays success and error sounds if regular expression matches output line.
-    def fetchOutput(self, out, arg):
-        settings = self.config.settings
-
-        for line in iter(out.readline, b""):
-            lineString = line.decode()
-
-            # Apply the regex based line substitution if enabled
-            if settings["lineSubstitution"]:
-                lineString = re.sub(
-                    settings["substitutionRegex"],
-                    settings["substitutionReplacement"],
-                    lineString,
-                )
-
-            isOutputOn = self.ui.isOutputOn()
-
-            # Output the line via screen reader if the output is on and if the main frame is active or if background output is turned on
-            if isOutputOn and (self.active or self.config.settings["srBgOutput"]):
-                self.srOutput(lineString)
-
-            # Play sound if success regex matches
-            if settings["playSuccessSound"]:
-                match = re.search(settings["successRegex"], lineString)
-                if match is not None:
-                    self.playSuccess()
-
-            # Play sound if error regex matches
-            if settings["playErrorSound"]:
-                match = re.search(settings["errorRegex"], lineString)
-                if match is not None:
-                    self.playError()
-
-            # Append the line to the UI output if the output is on
-            if isOutputOn:
-                self.ui.setOutput(lineString, True)
-
-        out.close()
-        self.process = None
-        self.ui.setAsNotRunning()
-
-
-# Main function.
+    # Handles the progress of terminating the process tree of the given session, which is at the given stage ("terminate" or "kill") with the given number of processes, by outputting it via screen reader if the session is the active one.
+    def onSessionTerminate(self, session, stage, count):
+        if session is not self.session:
+            return
+        processes = "{} process{}".format(count, "" if count == 1 else "es")
+        if stage == "terminate":
+            self.srOutput("Terminating {}".format(processes), True)
+        else:
+            self.srOutput("Killing {}".format(processes), True)
+
+    # Handles the given exception raised by processing the output of the given session by outputting it via screen reader if the session is the active one.
+    def onSessionError(self, session, error):
+        if session is self.session:
+            self.srOutput("Output processing failed: {}".format(error), True)
+
+    # Handles the given process output line of the given session with the given success and error match and standard error output flags. Depending on the current settings, outputs the line via screen reader, prefixed with the "srStderrPrefix" setting if it comes from the standard error output, and plays success and error sounds. Called from the consumer thread.
+    def onSessionLine(self, session, line, isSuccess, isError, isStderr):
+        # Schedule the line to be announced via screen reader if the session is the active one, the output is on and if the main frame is active or if background output is turned on. Lines matching the error regex interrupt the current announcement
+        if (
+            session is self.session
+            and self.ui.isOutputOn()
+            and (self.active or self.config.settings["srBgOutput"])
+        ):
+            priority = Announcer.HIGH if isError else Announcer.NORMAL
+            if isStderr:
+                line = self.config.settings["srStderrPrefix"] + line
+            self.announcer.announce(line, priority)
+
+        # Play sound if success regex matches
+        if isSuccess:
+            self.playSuccess()
+
+        # Play sound if error regex matches
+        if isError:
+            self.playError()
+
+
+# Reports the time from the application start to the first main window event. The report is printed to the standard error output or, if there is none, e.g., in the frozen build without a console, appended to the startup-time.txt file in the application data directory, whose path is output via screen reader of the given runner.
+def reportStartupTime(runner):
+    report = "Time to first window: {:.0f} ms".format(
+        (time.perf_counter() - START_TIME) * 1000
+    )
+    if sys.stderr is not None:
+        print(report, file=sys.stderr)
+        return
+    path = os.path.join(
+        os.path.dirname(Config.APPDATA_CONFIG_PATH), "startup-time.txt"
+    )
+    try:
+        with open(path, "a", encoding="utf-8") as file:
+            file.write("{} {}\n".format(time.strftime("%Y-%m-%d %H:%M:%S"), report))
+    except OSError as e:
+        runner.srOutput("{}. Not saved: {}".format(report, e), True)
+        return
+    runner.srOutput("{}. Saved to {}".format(report, path), True)
+
+
+# Main function. If the "--startup-time" argument is given, the time to the first window is reported.
 def main():
     app = wx.App()
     config = Config()
     runner = AccessibleRunner(config)
     mainFrame = MainFrame(runner, config, title=MainFrame.WINDOW_TITLE)
     runner.setUI(mainFrame)
+    if "--startup-time" in sys.argv:
+        wx.CallAfter(reportStartupTime, runner)
+    wx.CallAfter(runner.loadScreenReader)
     app.MainLoop()
     del app
 
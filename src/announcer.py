@@ -0,0 +1,117 @@
+from collections import deque
+from threading import Condition, Thread
+import time
+
+from stats import PipelineStats
+
+# Screen reader announcement scheduler class. Output lines are announced from a separate thread at most the given number of times per second. Bursts of lines are coalesced into a summary followed by the most recent line, lines waiting longer than the given maximum age are dropped, and high priority announcements, i.e., the error lines, interrupt the current speech and jump the queue. High priority announcements are rate limited too: only the most recent one is kept and when more of them are waiting for the next time slot, they are coalesced into their count followed by the most recent one.
+class Announcer:
+
+    # Announcement priorities
+    NORMAL = 0
+    HIGH = 1
+
+    # Maximum number of waiting lines which are still announced one by one. When more lines are waiting, they are coalesced into a summary.
+    BURST_LIMIT = 10
+
+    # Initializes the object with the given output function accepting the text and the interrupt flag, the maximum number of announcements per second and the maximum age of a waiting line in seconds, and starts the announcing thread.
+    def __init__(self, output, maxPerSecond, maxAge):
+        self.output = output
+        self.condition = Condition()
+        self.lines = deque()
+        self.urgent = None
+        self.urgentCount = 0
+        self.skipped = 0
+        self.nextTime = 0
+        self.stats = PipelineStats.shared().get("announce")
+        self.setLimits(maxPerSecond, maxAge)
+
+        thread = Thread(target=self.run)
+        thread.daemon = True  # Thread dies with the program
+        thread.start()
+
+    # Sets the maximum number of announcements per second and the maximum age of a waiting line in seconds.
+    def setLimits(self, maxPerSecond, maxAge):
+        with self.condition:
+            self.interval = 1 / max(maxPerSecond, 1)
+            self.maxAge = maxAge
+            self.condition.notify()
+
+    # Schedules the given text to be announced with the given priority.
+    def announce(self, text, priority=NORMAL):
+        with self.condition:
+            if priority == Announcer.HIGH:
+                self.urgent = text
+                self.urgentCount += 1
+            else:
+                self.lines.append((time.monotonic(), text))
+            self.condition.notify()
+
+    # Drops all the waiting announcements.
+    def clear(self):
+        with self.condition:
+            self.lines.clear()
+            self.urgent = None
+            self.urgentCount = 0
+            self.skipped = 0
+
+    # Returns the number of the waiting lines, including the dropped ones and the high priority ones which will be summarized, and the number of seconds the oldest waiting line has been waiting.
+    def getBacklog(self):
+        with self.condition:
+            age = time.monotonic() - self.lines[0][0] if self.lines else 0
+            return len(self.lines) + self.skipped + self.urgentCount, age
+
+    # Announces the scheduled texts forever, timing the output in the pipeline statistics.
+    def run(self):
+        while True:
+            with self.condition:
+                text, interrupt = self.next()
+            start = time.perf_counter_ns()
+            self.output(text, interrupt)
+            self.stats.add(1, time.perf_counter_ns() - start)
+
+    # Waits until the next announcement is due and returns its text and interrupt flag. Must be called with the condition lock held.
+    def next(self):
+        while True:
+            now = time.monotonic()
+            if not self.lines and not self.skipped and not self.urgentCount:
+                self.condition.wait()
+                continue
+            if now < self.nextTime:
+                self.condition.wait(self.nextTime - now)
+                continue
+            self.nextTime = now + self.interval
+
+            # High priority announcements take the next time slot before the waiting lines
+            if self.urgentCount:
+                return self.summarizeUrgent(), True
+
+            # Drop the lines which have been waiting for too long
+            while self.lines and now - self.lines[0][0] > self.maxAge:
+                self.lines.popleft()
+                self.skipped += 1
+
+            if self.skipped or len(self.lines) > Announcer.BURST_LIMIT:
+                return self.summarize(), False
+            return self.lines.popleft()[1], False
+
+    # Returns the summary of the skipped and waiting lines followed by the most recent line, and drops all of them. Must be called with the condition lock held.
+    def summarize(self):
+        lastLine = self.lines.pop()[1] if self.lines else ""
+        count = self.skipped + len(self.lines)
+        self.lines.clear()
+        self.skipped = 0
+        summary = "{} more line{}".format(count, "" if count == 1 else "s")
+        if lastLine:
+            summary += "\n" + lastLine
+        return summary
+
+    # Returns the most recent high priority announcement, preceded by the count of the waiting ones if there are more of them, and drops all of them. Must be called with the condition lock held.
+    def summarizeUrgent(self):
+        text = self.urgent
+        count = self.urgentCount
+        self.urgent = None
+        self.urgentCount = 0
+        if count == 1:
+            return text
+        return "{} errors\n{}".format(count, text)
@@ -0,0 +1,61 @@
+import asyncio
+import os
+import sys
+import warnings
+from threading import Lock, Thread
+
+ON_WINDOWS = os.name == "nt"
+
+# Asyncio loop class. Runs a single asyncio event loop in its own thread, so that the processes of all the sessions using the asyncio backend are started, read, timed out and waited for by one thread, without a thread per pipe or per process. On Windows the default proactor event loop is used, which supports subprocesses and pipes. Coroutines are submitted from other threads, e.g., from the wx main thread.
+class AsyncLoop:
+
+    # Shared loop instance
+    sharedLoop = None
+
+    # Returns the loop instance shared by all the process sessions, creating it on the first call.
+    @staticmethod
+    def shared():
+        if AsyncLoop.sharedLoop is None:
+            AsyncLoop.sharedLoop = AsyncLoop()
+        return AsyncLoop.sharedLoop
+
+    # Initializes the object. The loop thread is started when the first coroutine is submitted.
+    def __init__(self):
+        self.lock = Lock()
+        self.loop = None
+        self.thread = None
+
+    # Submits the given coroutine to the loop and returns its concurrent.futures.Future.
+    def submit(self, coroutine):
+        with self.lock:
+            if self.thread is None:
+                self.start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    # Creates the event loop and starts the loop thread. Must be called with the lock held.
+    def start(self):
+        self.loop = asyncio.new_event_loop()
+        if not ON_WINDOWS:
+            self.setChildWatcher()
+        self.thread = Thread(target=self.run)
+        self.thread.daemon = True  # Thread dies with the program
+        self.thread.start()
+
+    # Runs the event loop forever in the loop thread.
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    # Makes asyncio wait for the child processes using process file descriptors instead of a thread per process if the system supports it. Python 3.12 and newer do this by default.
+    def setChildWatcher(self):
+        if sys.version_info >= (3, 12) or not hasattr(os, "pidfd_open"):
+            return
+        try:
+            os.close(os.pidfd_open(os.getpid()))
+        except OSError:
+            return
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            watcher = asyncio.PidfdChildWatcher()
+            watcher.attach_loop(self.loop)
+            asyncio.set_child_watcher(watcher)
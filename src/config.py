@@ -10,6 +10,9 @@ class Config:
     # Path to the config file in the standard writable application data directory (AppData on Windows with the actually used configuration values.
     APPDATA_CONFIG_PATH = os.environ["APPDATA"] + "\\AccessibleRunner\\config.json"
 
+    # Path to the default directory of the output log files in the standard writable application data directory.
+    APPDATA_LOGS_PATH = os.environ["APPDATA"] + "\\AccessibleRunner\\logs"
+
     # Initializes the object by loading the configuration from file. If a configuration value exists in the config file at the standard writable application data directory (AppData on Windows), it is used, otherwise the default configuration value is loaded from the default config file.
     def __init__(self):
         # Load the default config file
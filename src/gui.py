@@ -1,11 +1,55 @@
-import markdown2
+from bisect import bisect_right
 import os
 import sys
 import re
+import time
 import wx
-import wx.html2
 
-import util
+from helppage import getHelpHTML
+from output import LineIndex
+from stats import PipelineStats
+from rules import InvalidRuleError
+from search import compilePattern, LineFilter, SearchIndex, Searcher
+
+ON_WINDOWS = os.name == "nt"
+
+# Process session view class. Holds the state of showing the output of one process session in the output textbox, i.e., the search index, the searcher and the find position of the session, and the line filter of the session with its own searcher.
+class SessionView:
+
+    # Initializes the object for the given process session. The given new line length and memory limit are used for the search index.
+    def __init__(self, session, newlineLength, memoryLimit):
+        self.session = session
+        self.search = SearchIndex(session.output, newlineLength, memoryLimit=memoryLimit)
+        self.searcher = Searcher(session.output)
+        self.findHits = []
+        self.findPosition = None
+        self.findWidgetPosition = None
+        self.shownLength = 0
+        self.filter = None
+        self.filterSearcher = Searcher(session.output)
+
+    # Clears the output of the session and the search and filter state.
+    def clear(self):
+        self.searcher.cancel()
+        self.filterSearcher.cancel()
+        self.session.output.clear()
+        self.search.clear()
+        self.shownLength = 0
+        self.findWidgetPosition = None
+        if self.filter is not None:
+            self.filter = self.filter.copy()
+
+    # Indexes the output which has not been shown yet and returns it.
+    def catchUp(self):
+        output = self.session.output
+        length = output.getLength()
+        if length <= self.shownLength:
+            return ""
+        text = output.getRange(self.shownLength, length)
+        self.shownLength = length
+        self.search.append(text)
+        return text
+
 
 # Main frame class.
 class MainFrame(wx.Frame):
@@ -18,12 +62,28 @@ class MainFrame(wx.Frame):
         super(MainFrame, self).__init__(parent, title=title)
         self.runner = runner
         self.config = config
+        self.views = {}
+        self.view = None
+        self.output = runner.session.output
+        self.flushScheduled = False
+        self.lastFlushTime = 0
+        self.filterOn = False
+        self.filterView = None
+        self.filterFirstIndex = 0
+        self.appendStats = PipelineStats.shared().get("append")
+        self.settingsDialog = None
+        self.findDialog = None
+        self.filterDialog = None
+        self.helpDialog = None
 
         self.Bind(wx.EVT_CLOSE, self.onWindowClose)
         self.Bind(wx.EVT_ACTIVATE, self.onWindowActivate)
         self.Bind(wx.EVT_CHAR_HOOK, self.charHook)
 
         self.addWidgets()
+        for session in runner.sessions:
+            self.addSession(session)
+        self.showSession(runner.session, False)
         self.Centre()
         self.Show()
         self.Fit()
@@ -32,21 +92,28 @@ class MainFrame(wx.Frame):
     def addWidgets(self):
         self.panel = wx.Panel(self)
         vbox = wx.BoxSizer(wx.VERTICAL)
-        history = self.config.history
         settings = self.config.settings
 
         # Command combobox
         commandHbox = wx.BoxSizer(wx.HORIZONTAL)
         commandLabel = wx.StaticText(self.panel, -1, "Command")
         commandHbox.Add(commandLabel, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5)
-        self.commandCombobox = wx.ComboBox(self.panel, choices=history["commands"])
+        self.commandCombobox = wx.ComboBox(
+            self.panel, choices=self.runner.getHistoryChoices("commands")
+        )
+        self.commandCombobox.AutoComplete(HistoryCompleter(self.runner, "commands"))
         commandHbox.Add(self.commandCombobox, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5)
 
         # Working directory combobox
         directoryHbox = wx.BoxSizer(wx.HORIZONTAL)
         directoryLabel = wx.StaticText(self.panel, -1, "Working directory")
         directoryHbox.Add(directoryLabel, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5)
-        self.directoryCombobox = wx.ComboBox(self.panel, choices=history["directories"])
+        self.directoryCombobox = wx.ComboBox(
+            self.panel, choices=self.runner.getHistoryChoices("directories")
+        )
+        self.directoryCombobox.AutoComplete(
+            HistoryCompleter(self.runner, "directories")
+        )
         directoryHbox.Add(
             self.directoryCombobox, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5
         )
@@ -66,6 +133,8 @@ class MainFrame(wx.Frame):
             self.panel, label="Command output", pos=(10, 10)
         )
         self.outputToggleCheckbox.SetValue(settings["outputOn"])
+        self.outputToggleCheckbox.Bind(wx.EVT_CHECKBOX, self.onOutputToggleCheckboxClick)
+        self.outputOn = settings["outputOn"]
         outputToggleHbox.Add(
             self.outputToggleCheckbox, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5
         )
@@ -93,15 +162,30 @@ class MainFrame(wx.Frame):
         self.killButton.Bind(wx.EVT_BUTTON, self.onKillButtonClick)
         runAndKillHbox.Add(self.killButton, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5)
 
+        # Session choice
+        sessionHbox = wx.BoxSizer(wx.HORIZONTAL)
+        sessionLabel = wx.StaticText(self.panel, -1, "Session")
+        sessionHbox.Add(sessionLabel, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5)
+        self.sessionChoice = wx.Choice(self.panel)
+        self.sessionChoice.Bind(wx.EVT_CHOICE, self.onSessionChoice)
+        sessionHbox.Add(self.sessionChoice, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5)
+
         # Output textbox
         outputHbox = wx.BoxSizer(wx.HORIZONTAL)
-        outputLabel = wx.StaticText(self.panel, -1, "Output")
-        outputHbox.Add(outputLabel, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5)
+        self.outputLabel = wx.StaticText(self.panel, -1, "Output")
+        outputHbox.Add(self.outputLabel, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5)
         self.outputTextbox = wx.TextCtrl(
             self.panel, size=(600, 150), style=wx.TE_MULTILINE | wx.TE_READONLY
         )
         outputHbox.Add(self.outputTextbox, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5)
 
+        # Filtered output textbox, shown instead of the output textbox when the filter is on
+        self.filterTextbox = wx.TextCtrl(
+            self.panel, size=(600, 150), style=wx.TE_MULTILINE | wx.TE_READONLY
+        )
+        self.filterTextbox.Hide()
+        outputHbox.Add(self.filterTextbox, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5)
+
         bottomButtonsHbox = wx.BoxSizer(wx.HORIZONTAL)
 
         # Clear button
@@ -133,28 +217,101 @@ class MainFrame(wx.Frame):
         vbox.Add(outputToggleHbox)
         vbox.Add(useShellHbox)
         vbox.Add(runAndKillHbox)
+        vbox.Add(sessionHbox)
         vbox.Add(outputHbox)
         vbox.Add(bottomButtonsHbox)
 
         self.panel.SetSizer(vbox)
 
-    # Sets the GUI state as running.
+    # Sets the GUI state as running for the active session.
     def setAsRunning(self):
         self.SetTitle(
             "{}{}{}".format(
-                self.commandCombobox.GetValue().strip(),
+                self.view.session.command.strip(),
                 MainFrame.WINDOW_TITLE_SEPARATOR,
                 MainFrame.WINDOW_TITLE,
             )
         )
-        self.runButton.Disable()
         self.killButton.Enable()
+        self.updateSessionChoices()
 
-    # Sets the GUI state as not running.
+    # Sets the GUI state as not running for the active session. The output which is still queued is flushed first.
     def setAsNotRunning(self):
+        self.flushOutput()
         self.SetTitle(MainFrame.WINDOW_TITLE)
         self.killButton.Disable()
-        self.runButton.Enable()
+        self.updateSessionChoices()
+
+    # Adds the view of the given process session and subscribes to the session events.
+    def addSession(self, session):
+        self.views[session] = SessionView(
+            session, 2 if ON_WINDOWS else 1, self.config.settings["scrollbackLimit"]
+        )
+        session.setOutputOn(self.outputOn)
+        session.subscribe("output", lambda: self.onSessionOutput(session))
+        session.subscribe(
+            "end", lambda returnCode: wx.CallAfter(self.onSessionEnd, session)
+        )
+        self.updateSessionChoices()
+
+    # Sets the maximum number of characters of the search indexes of all the session views kept in memory.
+    def setMemoryLimit(self, memoryLimit):
+        for view in self.views.values():
+            view.search.setMemoryLimit(memoryLimit)
+
+    # Removes the view of the given process session.
+    def removeSession(self, session):
+        view = self.views.pop(session)
+        view.searcher.cancel()
+        self.updateSessionChoices()
+
+    # Shows the output of the given process session in the output textbox and sets the GUI state according to the session. The session is announced via screen reader if announce is True.
+    def showSession(self, session, announce=True):
+        if self.view is not None:
+            self.view.searcher.cancel()
+        view = self.views[session]
+        self.view = view
+        self.output = session.output
+        view.findWidgetPosition = None
+
+        # Catch up with the output appended while the session was not shown and show the output tail which fits in the scrollback limit
+        view.catchUp()
+        limit = self.config.settings["scrollbackLimit"]
+        widgetStart = 0
+        if view.shownLength > limit:
+            line = self.output.getLineNumber(view.shownLength - limit)
+            widgetStart = self.output.getLineStart(line)
+        view.search.setWidgetStart(widgetStart)
+        self.outputTextbox.SetValue(self.output.getRange(widgetStart, view.shownLength))
+        if self.filterOn:
+            self.applyFilter(False)
+
+        if session.isRunning():
+            self.setAsRunning()
+        else:
+            self.setAsNotRunning()
+        if announce:
+            self.runner.srOutput(self.getSessionLabel(session), True)
+
+    # Returns the label of the given process session describing its command and state.
+    def getSessionLabel(self, session):
+        number = self.runner.sessions.index(session) + 1
+        if session.isRunning():
+            state = "running"
+        elif session.returnCode is not None:
+            state = "exited with code {}".format(session.returnCode)
+        else:
+            state = "not started"
+        if not session.command:
+            return "{}: {}".format(number, state)
+        return "{}: {} ({})".format(number, session.command, state)
+
+    # Sets the labels of all the process sessions to the session choice and selects the active session.
+    def updateSessionChoices(self):
+        sessions = [session for session in self.runner.sessions if session in self.views]
+        self.sessionChoice.Set([self.getSessionLabel(session) for session in sessions])
+        if self.view is not None and self.view.session in sessions:
+            self.sessionChoice.SetSelection(sessions.index(self.view.session))
 
     # Cleans everything and closes the main window.
     def cleanAndClose(self):
@@ -173,13 +330,23 @@ class MainFrame(wx.Frame):
         useShell = self.useShellCheckbox.GetValue()
         self.runner.runProcess(command, directory, useShell)
 
-    # Sets the given choices to the given combobox.
+    # Sets the given choices to the given combobox. Only the choices which have moved, been added or been removed are changed, so that using an item from the history usually moves just that item.
     def setChoices(self, combobox, choices):
         value = combobox.GetValue()
-        combobox.Clear()
-        combobox.SetValue(value)
-        for choice in choices:
-            combobox.Append(choice)
+        items = combobox.GetItems()
+        for index, choice in enumerate(choices):
+            if index < len(items) and items[index] == choice:
+                continue
+            if choice in items:
+                oldIndex = items.index(choice, index)
+                combobox.Delete(oldIndex)
+                items.pop(oldIndex)
+            combobox.Insert(choice, index)
+            items.insert(index, choice)
+        for index in range(len(items) - 1, len(choices) - 1, -1):
+            combobox.Delete(index)
+        if combobox.GetValue() != value:
+            combobox.ChangeValue(value)
 
     # Sets the given choices to the command combobox.
     def setCommandChoices(self, choices):
@@ -193,80 +360,370 @@ class MainFrame(wx.Frame):
     def toggleOutput(self):
         newValue = not self.outputToggleCheckbox.GetValue()
         self.outputToggleCheckbox.SetValue(newValue)
+        self.setOutputOn(newValue)
         message = "Output is on" if newValue else "Output is off"
         self.runner.srOutput(message, True)
 
-    # Returns True if command output is on or False otherwise.
+    # Sets whether the output of all the process sessions is on.
+    def setOutputOn(self, outputOn):
+        self.outputOn = outputOn
+        for session in self.runner.sessions:
+            session.setOutputOn(outputOn)
+
+    # Returns True if command output is on or False otherwise. Safe to be called from any thread.
     def isOutputOn(self):
-        return self.outputToggleCheckbox.GetValue()
+        return self.outputOn
 
-    # Sets or appends the given text to the command output textbox.
+    # Sets or appends the given text to the command output buffer and shows it in the textbox.
     def setOutput(self, text, append=False):
-        if append:
-            self.outputTextbox.SetValue(self.outputTextbox.GetValue() + text)
+        if not append:
+            self.view.clear()
+            self.outputTextbox.SetValue("")
+            self.filterTextbox.SetValue("")
+            self.filterFirstIndex = 0
+        self.output.append(text, time.time())
+        self.flushOutput()
+
+    # Gets the text of the command output.
+    def getOutput(self):
+        return self.output.getText()
+
+    # Handles the new output appended to the output buffer by the given process session. Called from the consumer thread. The new output of the active session is shown in batches, at most "maxFlushesPerSecond" times per second, so that the textbox is not updated for every line. The output of the other sessions is shown when they are selected.
+    def onSessionOutput(self, session):
+        if self.view is None or session is not self.view.session:
+            return
+        if not self.flushScheduled:
+            self.flushScheduled = True
+            wx.CallAfter(self.scheduleFlush)
+
+    # Schedules the flush of the new output so that the configured maximum flush rate is not exceeded.
+    def scheduleFlush(self):
+        interval = 1 / max(self.config.settings["maxFlushesPerSecond"], 1)
+        delay = self.lastFlushTime + interval - time.monotonic()
+        if delay > 0:
+            wx.CallLater(int(delay * 1000) + 1, self.flushOutput)
         else:
-            self.outputTextbox.SetValue(text)
+            self.flushOutput()
+
+    # Handles the end of the process of the given session.
+    def onSessionEnd(self, session):
+        if (
+            session in self.views
+            and session is self.view.session
+            and not session.isRunning()
+        ):
+            self.setAsNotRunning()
+        else:
+            self.updateSessionChoices()
+
+    # Appends all the output of the active session which has not been shown yet to the output textbox at once. Only the new text is appended, without copying the existing output.
+    def flushOutput(self):
+        self.flushScheduled = False
+        self.lastFlushTime = time.monotonic()
+        text = self.view.catchUp()
+        if not text:
+            return
+        start = time.perf_counter_ns()
+        self.outputTextbox.AppendText(text)
+        self.trimOutputTextbox()
+        self.appendStats.add(len(text), time.perf_counter_ns() - start)
+        self.updateFilter()
+
+    # Returns the number of the characters of the active session output which have not been shown in the output textbox yet and the number of seconds the oldest of them has been waiting.
+    def getOutputBacklog(self):
+        output = self.view.session.output
+        pending = output.getLength() - self.view.shownLength
+        if pending <= 0:
+            return 0, 0
+        lineTime = output.getLineTime(output.getLineNumber(self.view.shownLength))
+        return pending, max(time.time() - lineTime, 0) if lineTime else 0
+
+    # Removes the oldest lines from the output textbox when it holds more than the scrollback limit of characters. The removed output stays in the output buffer, so it can still be found and copied.
+    def trimOutputTextbox(self):
+        limit = self.config.settings["scrollbackLimit"]
+        widgetStart = self.view.search.widgetStart
+        length = self.view.shownLength
+
+        # Trim only after the limit is exceeded by a tenth, so that the textbox is not trimmed on every append
+        if length - widgetStart <= limit + limit // 10:
+            return
+        line = self.output.getLineNumber(length - limit)
+        newStart = self.output.getLineStart(min(line + 1, self.output.getLineCount() - 1))
+        if newStart <= widgetStart:
+            return
+        self.outputTextbox.Remove(0, self.view.search.toWidgetPosition(newStart))
+        self.view.search.setWidgetStart(newStart)
+        self.view.findWidgetPosition = None
 
-    # Gets the text of the command output textbox.
-    def getOutput(self):
-        return self.outputTextbox.GetValue()
+    # Filters the output of the active session by the filter text stored in the settings and shows the matching lines instead of the output. The lines are filtered in the background. The number of the matching lines is output via screen reader if announce is True.
+    def applyFilter(self, announce=True):
+        settings = self.config.settings
+        try:
+            lineFilter = LineFilter(
+                self.output,
+                settings["filterText"],
+                settings["filterRegex"],
+                settings["filterIgnoreCase"],
+                settings["filterStream"],
+            )
+        except re.error:
+            self.runner.srOutput("Invalid regular expression", True)
+            return
+        view = self.view
+        view.filter = lineFilter
+        self.filterView = None
+        self.filterTextbox.SetValue("")
+        self.filterFirstIndex = 0
+        self.showFilter(True)
+        self.startFiltering(view, True, announce)
+
+    # Turns the filter on or off. When turned on again, the filter of the active session is reused if its text has not changed, so only the output appended in the meantime is filtered.
+    def toggleFilter(self):
+        if self.filterOn:
+            self.view.filterSearcher.cancel()
+            self.showFilter(False)
+            self.runner.srOutput("Filter off", True)
+            return
+        settings = self.config.settings
+        view = self.view
+        if len(settings["filterText"]) == 0 and settings["filterStream"] == "all":
+            self.showFilterDialog()
+        elif (
+            view.filter is not None
+            and self.filterView is view
+            and view.filter.key
+            == (
+                settings["filterText"],
+                settings["filterRegex"],
+                settings["filterIgnoreCase"],
+                settings["filterStream"],
+            )
+        ):
+            self.showFilter(True)
+            self.startFiltering(view, False, True)
+        else:
+            self.applyFilter()
+
+    # Shows the filtered output textbox instead of the output textbox if shown is True or vice versa.
+    def showFilter(self, shown):
+        focused = self.FindFocus() in (self.outputTextbox, self.filterTextbox)
+        self.filterOn = shown
+        self.outputTextbox.Show(not shown)
+        self.filterTextbox.Show(shown)
+        self.outputLabel.SetLabel("Filtered output" if shown else "Output")
+        self.panel.Layout()
+        if focused:
+            (self.filterTextbox if shown else self.outputTextbox).SetFocus()
+
+    # Starts filtering the shown output of the given session view in the background. The filtered text replaces the filtered output textbox content if replace is True, otherwise it is appended.
+    def startFiltering(self, view, replace, announce):
+        view.filterSearcher.filter(
+            view.filter,
+            view.shownLength,
+            lambda job, text: wx.CallAfter(
+                self.onFilterDone, job, view, text, replace, announce
+            ),
+        )
 
-    # Moves the cursor of the output textbox to the given position and outputs the line at that position in the given text via screen reader.
-    def moveCursorAndOutputLine(self, text, position):
-        self.outputTextbox.SetInsertionPoint(position)
-        line = util.getLine(text, position)
+    # Handles the end of the background filtering of the given session view.
+    def onFilterDone(self, job, view, text, replace, announce):
+        if job is not view.filterSearcher.job or view is not self.view:
+            return
+        view.filterSearcher.job = None
+        self.filterView = view
+        if replace:
+            self.filterTextbox.SetValue(text)
+        else:
+            self.filterTextbox.AppendText(text)
+
+        # Filter the output shown while filtering
+        self.updateFilter()
+        if announce:
+            count = view.filter.getCount()
+            self.runner.srOutput(
+                "{} matching line{}".format(count, "" if count == 1 else "s"), True
+            )
+
+    # Filters the output lines appended since the last update and appends the matching lines to the filtered output textbox, unless the filter is off or is being computed in the background.
+    def updateFilter(self):
+        view = self.view
+        if (
+            not self.filterOn
+            or self.filterView is not view
+            or view.filterSearcher.job is not None
+        ):
+            return
+        text = view.filter.update(view.shownLength)
+        if text:
+            self.filterTextbox.AppendText(text)
+            self.trimFilterTextbox()
+
+    # Removes the oldest lines from the filtered output textbox when it holds more than the scrollback limit of characters.
+    def trimFilterTextbox(self):
+        limit = self.config.settings["scrollbackLimit"]
+        length = self.filterTextbox.GetLastPosition()
+        if length <= limit + limit // 10:
+            return
+        found, column, line = self.filterTextbox.PositionToXY(length - limit)
+        if not found:
+            return
+        self.filterTextbox.Remove(0, self.filterTextbox.XYToPosition(0, line + 1))
+        self.filterFirstIndex += line + 1
+
+    # Turns the filter off and moves the cursor of the output textbox to the output line which is at the cursor of the filtered output textbox.
+    def goToFilteredLine(self):
+        view = self.view
+        found, column, line = self.filterTextbox.PositionToXY(
+            self.filterTextbox.GetInsertionPoint()
+        )
+        index = self.filterFirstIndex + line
+        if (
+            not found
+            or view.filter is None
+            or self.filterView is not view
+            or index >= view.filter.getCount()
+        ):
+            return
+        self.showFilter(False)
+        self.outputTextbox.SetFocus()
+        self.moveCursorAndOutputLine(
+            self.output.getLineStart(view.filter.getLineNumber(index))
+        )
+
+    # Moves the cursor of the output textbox to the given output position and outputs the line at that position via screen reader. The filter is turned off first, if it is on. If the position has already been removed from the textbox, the cursor is moved to the beginning of the textbox and the line is output together with its number.
+    def moveCursorAndOutputLine(self, position):
+        if self.filterOn:
+            self.showFilter(False)
+        line = self.output.getLineAt(position)
+        if position >= self.view.search.widgetStart:
+            widgetPosition = self.view.search.toWidgetPosition(position)
+        else:
+            widgetPosition = 0
+            line = "Line {}: {}".format(self.output.getLineNumber(position) + 1, line)
+        self.outputTextbox.SetInsertionPoint(widgetPosition)
+        self.view.findPosition = position
+        self.view.findWidgetPosition = widgetPosition
         self.runner.srOutput(line)
 
-    # Finds the next occurance of the  text stored in the temporary settings in the output textbox, moves the insertion point to that occurance and outputs the found word via screen reader.
+    # Outputs the number, arrival time, stream and rule matches of the output line at the cursor via screen reader.
+    def outputLineInfo(self):
+        number = self.output.getLineNumber(self.getCursorPosition())
+        flags = self.output.getLineFlags(number)
+        info = ["Line {}".format(number + 1)]
+        lineTime = self.output.getLineTime(number)
+        if lineTime:
+            info.append(time.strftime("%H:%M:%S", time.localtime(lineTime)))
+        if flags & LineIndex.STDERR:
+            info.append("error output")
+        if flags & LineIndex.SUCCESS:
+            info.append("success match")
+        if flags & LineIndex.ERROR:
+            info.append("error match")
+        self.runner.srOutput(", ".join(info), True)
+
+    # Returns the output position of the output textbox cursor. If the cursor has not moved since the last find, the found position is returned, so that finding can continue in the output which has been removed from the textbox.
+    def getCursorPosition(self):
+        widgetPosition = self.outputTextbox.GetInsertionPoint()
+        if widgetPosition == self.view.findWidgetPosition:
+            return self.view.findPosition
+        return self.view.search.toPosition(widgetPosition)
+
+    # Finds the next occurance of the  text stored in the temporary settings in the output, moves the insertion point to that occurance and outputs the found line via screen reader. The text is found in the background by the searcher, so that finding in a huge output does not block the UI. Literal text is found using the output search index, so the output text is not copied.
     def findText(self, backward=False):
         settings = self.config.settings
         findText = settings["findText"]
         if len(findText) == 0:
             return
+        ignoreCase = settings["ignoreCase"]
+        cursorPosition = self.getCursorPosition()
 
-        # Replace the \n line endings in the output text with the \r\n (Windows) ones
-        origCaseOutputText = self.outputTextbox.GetValue().replace("\n", "\r\n")
-
-        # Determine whether find should be case sensitive
-        if settings["ignoreCase"]:
-            findText = findText.lower()
-            outputText = origCaseOutputText.lower()
-        else:
-            outputText = origCaseOutputText
-
-        cursorPosition = self.outputTextbox.GetInsertionPoint()
-        if not backward:
-            # Find forward, i.e., find the first text occurrance in the output text substring starting at the cursor position + 1 until the end
-            findStartPosition = cursorPosition + 1
-            foundPosition = outputText.find(findText, findStartPosition)
-            if foundPosition >= 0:
-                self.moveCursorAndOutputLine(origCaseOutputText, foundPosition)
-            else:
-                self.runner.playNotFound()
-
-                # Wrap the find to the top, i.e., find the first text occurance again, but now starting at the begining of the output text and ending at the foundPosition
-                foundPosition = outputText.find(findText, 0, foundPosition)
-                if foundPosition >= 0:
-                    self.runner.srOutput("Wrapping to top", True)
-                    self.moveCursorAndOutputLine(origCaseOutputText, foundPosition)
-                else:
-                    self.runner.srOutput("Search string not found")
+        onDone = lambda job, position, wrapped: wx.CallAfter(
+            self.onFindNextDone, job, position, wrapped, backward
+        )
+        if settings["findRegex"]:
+            try:
+                pattern = compilePattern(findText, True, ignoreCase)
+            except re.error:
+                self.runner.srOutput("Invalid regular expression", True)
+                return
+            self.view.searcher.findNext(
+                pattern, cursorPosition, backward, self.view.shownLength, onDone
+            )
         else:
-            # Find backward, i.e., find the last text occurrance in the output text substring starting at the begining until the cursor position - 1
-            findEndPosition = cursorPosition - 1
-            foundPosition = outputText.rfind(findText, 0, findEndPosition)
-            if foundPosition >= 0:
-                self.moveCursorAndOutputLine(origCaseOutputText, foundPosition)
-            else:
-                self.runner.playNotFound()
-
-                # Wrap the find to the bottom, i.e., find the last text occurrance again, but now starting at the previously found position and ending at the end of the output text
-                foundPosition = outputText.rfind(findText, 0)
-                if foundPosition >= 0:
-                    self.runner.srOutput("Wrapping to bottom", True)
-                    self.moveCursorAndOutputLine(origCaseOutputText, foundPosition)
-                else:
-                    self.runner.srOutput("Search string not found", True)
+            self.view.searcher.findTextNext(
+                self.view.search,
+                findText,
+                ignoreCase,
+                cursorPosition,
+                backward,
+                self.view.shownLength,
+                onDone,
+            )
+
+    # Moves the cursor to the given found position and outputs the found line via screen reader. If the find wrapped around the output, the not found sound is played first.
+    def showFindResult(self, foundPosition, wrapped, backward):
+        if wrapped:
+            self.runner.playNotFound()
+        if foundPosition < 0:
+            self.runner.srOutput("Search string not found", True)
+            return
+        if wrapped:
+            message = "Wrapping to bottom" if backward else "Wrapping to top"
+            self.runner.srOutput(message, True)
+        self.moveCursorAndOutputLine(foundPosition)
+
+    # Finds all the occurances of the text stored in the temporary settings in the output in the background. When finished, the number of occurances is output via screen reader and the cursor is moved to the first occurance after the cursor.
+    def findAll(self):
+        settings = self.config.settings
+        findText = settings["findText"]
+        if len(findText) == 0:
+            return
+        try:
+            pattern = compilePattern(
+                findText, settings["findRegex"], settings["ignoreCase"]
+            )
+        except re.error:
+            self.runner.srOutput("Invalid regular expression", True)
+            return
+
+        self.view.findHits = []
+        self.runner.srOutput("Finding all", True)
+        self.view.searcher.findAll(
+            pattern,
+            self.view.shownLength,
+            lambda job, hits: wx.CallAfter(self.onFindAllHits, job, hits),
+            lambda job, count: wx.CallAfter(self.onFindAllDone, job, count),
+        )
+
+    # Handles the next found occurance.
+    def onFindNextDone(self, job, foundPosition, wrapped, backward):
+        if job is not self.view.searcher.job:
+            return
+        self.showFindResult(foundPosition, wrapped, backward)
+
+    # Handles the occurances streamed from the find all search.
+    def onFindAllHits(self, job, hits):
+        if job is not self.view.searcher.job:
+            return
+        self.view.findHits.extend(hits)
+
+    # Handles the end of the find all search.
+    def onFindAllDone(self, job, count):
+        if job is not self.view.searcher.job:
+            return
+        if count == 0:
+            self.runner.playNotFound()
+            self.runner.srOutput("Search string not found", True)
+            return
+        self.runner.srOutput(
+            "{} match{} found".format(count, "" if count == 1 else "es"), True
+        )
+
+        # Move to the first occurance after the cursor or wrap to the first one
+        cursorPosition = self.getCursorPosition()
+        index = bisect_right(self.view.findHits, cursorPosition)
+        position = self.view.findHits[index if index < len(self.view.findHits) else 0]
+        self.moveCursorAndOutputLine(position)
 
     # Handles  the window close event.
     def onWindowClose(self, event):
@@ -314,6 +771,22 @@ class MainFrame(wx.Frame):
         elif (key == ord("F")) and onlyControlDown:
             self.showFindDialog()
 
+        # Control + Shift + F
+        elif (key == ord("F")) and onlyControlAndShiftDown:
+            self.showFilterDialog()
+
+        # Control + G
+        elif (key == ord("G")) and onlyControlDown:
+            self.toggleFilter()
+
+        # Enter in the filtered output textbox
+        elif (
+            (key == wx.WXK_RETURN)
+            and noModifiers
+            and self.FindFocus() is self.filterTextbox
+        ):
+            self.goToFilteredLine()
+
         # F3
         elif (key == wx.WXK_F3) and noModifiers:
             self.findText()
@@ -334,6 +807,35 @@ class MainFrame(wx.Frame):
         elif (key == ord("D")) and onlyControlDown:
             self.runner.clearOutput()
 
+        # Control + I
+        elif (key == ord("I")) and onlyControlDown:
+            self.outputLineInfo()
+
+        # Control + U
+        elif (key == ord("U")) and onlyControlDown:
+            self.runner.outputResourceUsage()
+
+        # Control + Shift + I
+        elif (key == ord("I")) and onlyControlAndShiftDown:
+            self.runner.outputPipelineStats()
+
+        # Control + Shift + D
+        elif (key == ord("D")) and onlyControlAndShiftDown:
+            self.runner.savePipelineStats()
+
+        # Control + Tab
+        elif (key == wx.WXK_TAB) and onlyControlDown:
+            self.runner.selectNextSession()
+
+        # Control + Shift + Tab
+        elif (key == wx.WXK_TAB) and onlyControlAndShiftDown:
+            self.runner.selectNextSession(True)
+
+        # Control + W
+        elif (key == ord("W")) and onlyControlDown:
+            if not self.runner.closeSession():
+                self.runner.srOutput("Cannot close a running or the only session", True)
+
         else:
             event.Skip()
 
@@ -353,6 +855,14 @@ class MainFrame(wx.Frame):
             self.directoryCombobox.SetFocus()
         dialog.Destroy()
 
+    # Handles the output toggle checkbox click.
+    def onOutputToggleCheckboxClick(self, event):
+        self.setOutputOn(self.outputToggleCheckbox.GetValue())
+
+    # Handles the session choice selection.
+    def onSessionChoice(self, event):
+        self.runner.selectSession(self.runner.sessions[self.sessionChoice.GetSelection()])
+
     # Handles the run button click.
     def onRunButtonClick(self, event):
         self.runProcess()
@@ -371,58 +881,92 @@ class MainFrame(wx.Frame):
 
     # Handles the settings button click.
     def onSettingsButtonClick(self, event):
-        SettingsDialog(
-            self.runner,
-            self.config,
-            title="Settings{}{}".format(
-                MainFrame.WINDOW_TITLE_SEPARATOR, MainFrame.WINDOW_TITLE
-            ),
-            parent=self,
-        )
+        if self.settingsDialog is None:
+            self.settingsDialog = SettingsDialog(
+                self.runner,
+                self.config,
+                title="Settings{}{}".format(
+                    MainFrame.WINDOW_TITLE_SEPARATOR, MainFrame.WINDOW_TITLE
+                ),
+                parent=self,
+            )
+        self.settingsDialog.show()
 
     # Handles the help button click.
     def onHelpButtonClick(self, event):
-        helpDialog = HelpHtmlDialog(
-            title="Help{}{}".format(
-                MainFrame.WINDOW_TITLE_SEPARATOR, MainFrame.WINDOW_TITLE
-            ),
-            parent=self,
-        )
+        if self.helpDialog is None:
+            self.helpDialog = HelpHtmlDialog(
+                title="Help{}{}".format(
+                    MainFrame.WINDOW_TITLE_SEPARATOR, MainFrame.WINDOW_TITLE
+                ),
+                parent=self,
+            )
+        self.helpDialog.show()
 
     # Shows the find text dialog
     def showFindDialog(self):
-        FindDialog(self.runner, self.config, title="Find text", parent=self)
+        if self.findDialog is None:
+            self.findDialog = FindDialog(
+                self.runner, self.config, title="Find text", parent=self
+            )
+        self.findDialog.show()
+
+    # Shows the filter dialog.
+    def showFilterDialog(self):
+        if self.filterDialog is None:
+            self.filterDialog = FilterDialog(
+                self.runner, self.config, title="Filter output", parent=self
+            )
+        self.filterDialog.show()
+
+
+# History completer class. Offers the best ranked items of a history record starting with the typed text as the completions of a combobox.
+class HistoryCompleter(wx.TextCompleterSimple):
+
+    # Initializes the object by linking it with the given AccessibleRunner object and the given history record.
+    def __init__(self, runner, record):
+        super(HistoryCompleter, self).__init__()
+        self.runner = runner
+        self.record = record
+
+    # Returns the completions of the given prefix. Nothing is completed for empty text, as all the best ranked items are in the combobox choices.
+    def GetCompletions(self, prefix):
+        if prefix == "":
+            return []
+        return self.runner.completeFromHistory(self.record, prefix)
 
 
 # Settings dialog class.
 class SettingsDialog(wx.Dialog):
 
-    # Initializes the object by linking it with the given AccessibleRunner and Config objects, binding the event handlers, and creating the GUI.
+    # Initializes the object by linking it with the given AccessibleRunner and Config objects, binding the event handlers, and creating the GUI. The dialog is created once and shown by the show method.
     def __init__(self, runner, config, title, parent=None):
         super(SettingsDialog, self).__init__(parent=parent, title=title)
         self.runner = runner
         self.config = config
 
         self.Bind(wx.EVT_CHAR_HOOK, self.charHook)
+        self.Bind(wx.EVT_CLOSE, self.onWindowClose)
 
         self.addWidgets()
+        self.Fit()
         self.Centre()
+
+    # Sets the widget values from the current configuration and shows the dialog.
+    def show(self):
+        self.loadValues()
         self.ShowModal()
-        self.Fit()
 
     # Adds all the initial widgets to this dialog.
     def addWidgets(self):
         self.panel = wx.Panel(self)
         vbox = wx.BoxSizer(wx.VERTICAL)
-        settings = self.config.settings
-        history = self.config.history
 
         # Screen reader output in background checkbox
         bgOutputHbox = wx.BoxSizer(wx.HORIZONTAL)
         self.bgOutputCheckbox = wx.CheckBox(
             self.panel, label="Screen reader output in background", pos=(10, 10)
         )
-        self.bgOutputCheckbox.SetValue(settings["srBgOutput"])
         bgOutputHbox.Add(
             self.bgOutputCheckbox, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5
         )
@@ -434,7 +978,6 @@ class SettingsDialog(wx.Dialog):
             label="Play success sound when regular expression matches",
             pos=(10, 10),
         )
-        self.playSuccessCheckbox.SetValue(settings["playSuccessSound"])
         self.playSuccessCheckbox.Bind(wx.EVT_CHECKBOX, self.onPlaySuccessCheckboxClick)
         playSuccessCheckboxHbox.Add(
             self.playSuccessCheckbox, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5
@@ -446,11 +989,7 @@ class SettingsDialog(wx.Dialog):
         successRegexHbox.Add(
             successRegexLabel, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5
         )
-        self.successRegexTextbox = wx.TextCtrl(
-            self.panel, value=settings["successRegex"]
-        )
-        if not settings["playSuccessSound"]:
-            self.successRegexTextbox.Disable()
+        self.successRegexTextbox = wx.TextCtrl(self.panel)
         successRegexHbox.Add(
             self.successRegexTextbox, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5
         )
@@ -462,7 +1001,6 @@ class SettingsDialog(wx.Dialog):
             label="Play error sound when regular expression matches",
             pos=(10, 10),
         )
-        self.playErrorCheckbox.SetValue(settings["playErrorSound"])
         self.playErrorCheckbox.Bind(wx.EVT_CHECKBOX, self.onPlayErrorCheckboxClick)
         playErrorCheckboxHbox.Add(
             self.playErrorCheckbox, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5
@@ -472,9 +1010,7 @@ class SettingsDialog(wx.Dialog):
         errorRegexHbox = wx.BoxSizer(wx.HORIZONTAL)
         errorRegexLabel = wx.StaticText(self.panel, -1, "Error regular expression")
         errorRegexHbox.Add(errorRegexLabel, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5)
-        self.errorRegexTextbox = wx.TextCtrl(self.panel, value=settings["errorRegex"])
-        if not settings["playErrorSound"]:
-            self.errorRegexTextbox.Disable()
+        self.errorRegexTextbox = wx.TextCtrl(self.panel)
         errorRegexHbox.Add(
             self.errorRegexTextbox, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5
         )
@@ -484,7 +1020,6 @@ class SettingsDialog(wx.Dialog):
         self.lineSubstitutionCheckbox = wx.CheckBox(
             self.panel, label="Enable line substitution", pos=(10, 10)
         )
-        self.lineSubstitutionCheckbox.SetValue(settings["lineSubstitution"])
         self.lineSubstitutionCheckbox.Bind(
             wx.EVT_CHECKBOX, self.onLineSubstitutionCheckboxClick
         )
@@ -500,13 +1035,7 @@ class SettingsDialog(wx.Dialog):
         substitutionRegexHbox.Add(
             substitutionRegexLabel, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5
         )
-        self.substitutionRegexCombobox = wx.ComboBox(
-            self.panel,
-            value=settings["substitutionRegex"],
-            choices=history["substitutionRegexes"],
-        )
-        if not settings["lineSubstitution"]:
-            self.substitutionRegexCombobox.Disable()
+        self.substitutionRegexCombobox = wx.ComboBox(self.panel)
         substitutionRegexHbox.Add(
             self.substitutionRegexCombobox, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5
         )
@@ -521,13 +1050,7 @@ class SettingsDialog(wx.Dialog):
         substitutionReplacementHbox.Add(
             substitutionReplacementLabel, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5
         )
-        self.substitutionReplacementCombobox = wx.ComboBox(
-            self.panel,
-            value=settings["substitutionReplacement"],
-            choices=history["substitutionReplacements"],
-        )
-        if not settings["lineSubstitution"]:
-            self.substitutionReplacementCombobox.Disable()
+        self.substitutionReplacementCombobox = wx.ComboBox(self.panel)
         substitutionReplacementHbox.Add(
             self.substitutionReplacementCombobox,
             1,
@@ -535,6 +1058,40 @@ class SettingsDialog(wx.Dialog):
             5,
         )
 
+        # Output encoding textbox
+        encodingHbox = wx.BoxSizer(wx.HORIZONTAL)
+        encodingLabel = wx.StaticText(
+            self.panel, -1, "Output encoding (for example utf-8, cp1252 or locale)"
+        )
+        encodingHbox.Add(encodingLabel, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5)
+        self.encodingTextbox = wx.TextCtrl(self.panel)
+        encodingHbox.Add(
+            self.encodingTextbox, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5
+        )
+
+        # Log output checkbox
+        logOutputCheckboxHbox = wx.BoxSizer(wx.HORIZONTAL)
+        self.logOutputCheckbox = wx.CheckBox(
+            self.panel, label="Log command output to files", pos=(10, 10)
+        )
+        self.logOutputCheckbox.Bind(wx.EVT_CHECKBOX, self.onLogOutputCheckboxClick)
+        logOutputCheckboxHbox.Add(
+            self.logOutputCheckbox, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5
+        )
+
+        # Log directory textbox
+        logDirectoryHbox = wx.BoxSizer(wx.HORIZONTAL)
+        logDirectoryLabel = wx.StaticText(
+            self.panel, -1, "Log directory (leave empty for the default)"
+        )
+        logDirectoryHbox.Add(
+            logDirectoryLabel, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5
+        )
+        self.logDirectoryTextbox = wx.TextCtrl(self.panel)
+        logDirectoryHbox.Add(
+            self.logDirectoryTextbox, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5
+        )
+
         cancelAndCloseHbox = wx.BoxSizer(wx.HORIZONTAL)
 
         # Cancel button
@@ -560,12 +1117,70 @@ class SettingsDialog(wx.Dialog):
         vbox.Add(lineSubstitutionCheckboxHbox)
         vbox.Add(substitutionRegexHbox)
         vbox.Add(substitutionReplacementHbox)
+        vbox.Add(encodingHbox)
+        vbox.Add(logOutputCheckboxHbox)
+        vbox.Add(logDirectoryHbox)
         vbox.Add(cancelAndCloseHbox)
         self.panel.SetSizer(vbox)
 
-    # Closes the dialog without any changes.
+    # Sets the widget values and states from the current settings and history.
+    def loadValues(self):
+        settings = self.config.settings
+        self.bgOutputCheckbox.SetValue(settings["srBgOutput"])
+        self.playSuccessCheckbox.SetValue(settings["playSuccessSound"])
+        self.successRegexTextbox.SetValue(settings["successRegex"])
+        self.successRegexTextbox.Enable(settings["playSuccessSound"])
+        self.playErrorCheckbox.SetValue(settings["playErrorSound"])
+        self.errorRegexTextbox.SetValue(settings["errorRegex"])
+        self.errorRegexTextbox.Enable(settings["playErrorSound"])
+        self.lineSubstitutionCheckbox.SetValue(settings["lineSubstitution"])
+        self.substitutionRegexCombobox.Set(
+            self.runner.getHistoryChoices("substitutionRegexes")
+        )
+        self.substitutionRegexCombobox.SetValue(settings["substitutionRegex"])
+        self.substitutionRegexCombobox.Enable(settings["lineSubstitution"])
+        self.substitutionReplacementCombobox.Set(
+            self.runner.getHistoryChoices("substitutionReplacements")
+        )
+        self.substitutionReplacementCombobox.SetValue(
+            settings["substitutionReplacement"]
+        )
+        self.substitutionReplacementCombobox.Enable(settings["lineSubstitution"])
+        self.encodingTextbox.SetValue(settings["outputEncoding"])
+        self.logOutputCheckbox.SetValue(settings["logOutput"])
+        self.logDirectoryTextbox.SetValue(settings["logDirectory"])
+        self.logDirectoryTextbox.Enable(settings["logOutput"])
+        self.bgOutputCheckbox.SetFocus()
+
+    # Closes the dialog without any changes. The dialog is only hidden, so that it can be shown again.
     def close(self):
-        self.Destroy()
+        self.EndModal(wx.ID_CLOSE)
+
+    # Handles the dialog window close event.
+    def onWindowClose(self, event):
+        self.close()
+
+    # Shows the message of the given invalid rule error and focuses the field with the invalid value.
+    def showInvalidRuleError(self, error):
+        fields = {
+            "successRegex": self.successRegexTextbox,
+            "errorRegex": self.errorRegexTextbox,
+            "substitutionRegex": self.substitutionRegexCombobox,
+            "substitutionReplacement": self.substitutionReplacementCombobox,
+        }
+        labels = {
+            "successRegex": "Success regular expression",
+            "errorRegex": "Error regular expression",
+            "substitutionRegex": "Line substitution regular expression",
+            "substitutionReplacement": "Line substitution replacement",
+        }
+        wx.MessageBox(
+            "{} is invalid: {}".format(labels[error.key], error.message),
+            "Invalid settings",
+            wx.OK | wx.ICON_ERROR,
+            self,
+        )
+        fields[error.key].SetFocus()
 
     # Handles  the key press events for the whole dialog.
     def charHook(self, event):
@@ -600,6 +1215,13 @@ class SettingsDialog(wx.Dialog):
             self.substitutionRegexCombobox.Disable()
             self.substitutionReplacementCombobox.Disable()
 
+    # Handles the log output checkbox click.
+    def onLogOutputCheckboxClick(self, event):
+        if self.logOutputCheckbox.GetValue():
+            self.logDirectoryTextbox.Enable()
+        else:
+            self.logDirectoryTextbox.Disable()
+
     # Handles the cancel button click.
     def onCancelButtonClick(self, event):
         self.close()
@@ -615,19 +1237,41 @@ class SettingsDialog(wx.Dialog):
             "lineSubstitution": self.lineSubstitutionCheckbox.GetValue(),
             "substitutionRegex": self.substitutionRegexCombobox.GetValue(),
             "substitutionReplacement": self.substitutionReplacementCombobox.GetValue(),
+            "logOutput": self.logOutputCheckbox.GetValue(),
+            "logDirectory": self.logDirectoryTextbox.GetValue().strip(),
+            "outputEncoding": self.encodingTextbox.GetValue().strip(),
         }
+
+        # Do not save the settings if any of the regular expressions or the encoding is invalid
+        try:
+            self.runner.validateRules(settings)
+        except InvalidRuleError as e:
+            self.showInvalidRuleError(e)
+            return
+        try:
+            self.runner.validateEncoding(settings)
+        except LookupError:
+            wx.MessageBox(
+                "Unknown output encoding: {}".format(settings["outputEncoding"]),
+                "Invalid settings",
+                wx.OK | wx.ICON_ERROR,
+                self,
+            )
+            self.encodingTextbox.SetFocus()
+            return
+
         self.runner.mergeSettings(settings)
         self.runner.addToSubstitutionRegexesHistory(settings["substitutionRegex"])
         self.runner.addToSubstitutionReplacementsHistory(
             settings["substitutionReplacement"]
         )
-        self.Destroy()
+        self.close()
 
 
 # Find text dialog class.
 class FindDialog(wx.Dialog):
 
-    # Initializes the object by linking it with the given AccessibleRunner and Config objects, binding the event handlers, and creating the GUI.
+    # Initializes the object by linking it with the given AccessibleRunner and Config objects, binding the event handlers, and creating the GUI. The dialog is created once and shown by the show method.
     def __init__(self, runner, config, title, parent=None):
         super(FindDialog, self).__init__(parent=parent, title=title)
         self.parent = parent
@@ -635,26 +1279,27 @@ class FindDialog(wx.Dialog):
         self.config = config
 
         self.Bind(wx.EVT_CHAR_HOOK, self.charHook)
+        self.Bind(wx.EVT_CLOSE, self.onWindowClose)
 
         self.addWidgets()
+        self.Fit()
         self.Centre()
+
+    # Sets the widget values from the current configuration and shows the dialog.
+    def show(self):
+        self.loadValues()
         self.ShowModal()
-        self.Fit()
 
     # Adds all the initial widgets to this dialog.
     def addWidgets(self):
         self.panel = wx.Panel(self)
         vbox = wx.BoxSizer(wx.VERTICAL)
-        history = self.config.history
-        settings = self.config.settings
 
         # Find text combobox
         findComboboxHbox = wx.BoxSizer(wx.HORIZONTAL)
         findLabel = wx.StaticText(self.panel, -1, "Find what")
         findComboboxHbox.Add(findLabel, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5)
-        self.findCombobox = wx.ComboBox(
-            self.panel, choices=history["findTexts"], value=settings["findText"]
-        )
+        self.findCombobox = wx.ComboBox(self.panel)
         findComboboxHbox.Add(
             self.findCombobox, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5
         )
@@ -664,7 +1309,6 @@ class FindDialog(wx.Dialog):
         self.backwardCheckbox = wx.CheckBox(
             self.panel, label="Backward direction", pos=(10, 10)
         )
-        self.backwardCheckbox.SetValue(settings["findBackward"])
         self.backwardCheckbox.Bind(wx.EVT_CHECKBOX, self.onBackwardCheckboxClick)
         backwardHbox.Add(
             self.backwardCheckbox, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5
@@ -675,40 +1319,86 @@ class FindDialog(wx.Dialog):
         self.ignoreCaseCheckbox = wx.CheckBox(
             self.panel, label="Ignore case", pos=(10, 10)
         )
-        self.ignoreCaseCheckbox.SetValue(settings["ignoreCase"])
         self.ignoreCaseCheckbox.Bind(wx.EVT_CHECKBOX, self.onIgnoreCaseCheckboxClick)
         ignoreCaseHbox.Add(
             self.ignoreCaseCheckbox, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5
         )
 
-        # Find next button
+        # Regular expression checkbox
+        regexHbox = wx.BoxSizer(wx.HORIZONTAL)
+        self.regexCheckbox = wx.CheckBox(
+            self.panel, label="Regular expression", pos=(10, 10)
+        )
+        regexHbox.Add(self.regexCheckbox, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5)
+
         findButtonHbox = wx.BoxSizer(wx.HORIZONTAL)
+
+        # Find next button
         self.findButton = wx.Button(self.panel, label="Find next")
         self.findButton.SetDefault()
         self.findButton.Bind(wx.EVT_BUTTON, self.onFindButtonClick)
         findButtonHbox.Add(self.findButton, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5)
 
+        # Find all button
+        self.findAllButton = wx.Button(self.panel, label="Find all")
+        self.findAllButton.Bind(wx.EVT_BUTTON, self.onFindAllButtonClick)
+        findButtonHbox.Add(
+            self.findAllButton, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5
+        )
+
         vbox.Add(findComboboxHbox)
         vbox.Add(backwardHbox)
         vbox.Add(ignoreCaseHbox)
+        vbox.Add(regexHbox)
         vbox.Add(findButtonHbox)
 
         self.panel.SetSizer(vbox)
 
-    # Closes the dialog without any changes.
+    # Sets the widget values from the current settings and history.
+    def loadValues(self):
+        settings = self.config.settings
+        self.findCombobox.Set(self.runner.getHistoryChoices("findTexts"))
+        self.findCombobox.SetValue(settings["findText"])
+        self.backwardCheckbox.SetValue(settings["findBackward"])
+        self.ignoreCaseCheckbox.SetValue(settings["ignoreCase"])
+        self.regexCheckbox.SetValue(settings["findRegex"])
+        self.findCombobox.SetFocus()
+        self.findCombobox.SelectAll()
+
+    # Closes the dialog without any changes. The dialog is only hidden, so that it can be shown again.
     def close(self):
-        self.Destroy()
+        self.EndModal(wx.ID_CLOSE)
+
+    # Handles the dialog window close event.
+    def onWindowClose(self, event):
+        self.close()
 
-    # Temporary saves the find dialog combobox text and backward checkbox state, finds the next occurance of the text in the output textbox and moves the insertion point to that occurance. Finally closes the dialog.
-    def findTextAndClose(self):
+    # Temporary saves the find dialog combobox text and backward and regular expression checkbox states, finds the next occurance of the text in the output textbox and moves the insertion point to that occurance, or finds all the occurances if findAll is True. Finally closes the dialog. The dialog is not closed if the regular expression is invalid.
+    def findTextAndClose(self, findAll=False):
         settings = {
             "findText": self.findCombobox.GetValue(),
             "findBackward": self.backwardCheckbox.GetValue(),
+            "findRegex": self.regexCheckbox.GetValue(),
         }
+        if settings["findRegex"]:
+            try:
+                compilePattern(settings["findText"], True, False)
+            except re.error as e:
+                wx.MessageBox(
+                    "Invalid regular expression: {}".format(e),
+                    "Find text",
+                    wx.OK | wx.ICON_ERROR,
+                    self,
+                )
+                self.findCombobox.SetFocus()
+                return
         self.runner.mergeSettings(settings)
 
         self.runner.addToFindTextsHistory(settings["findText"])
-        self.parent.findText(settings["findBackward"])
+        if findAll:
+            self.parent.findAll()
+        else:
+            self.parent.findText(settings["findBackward"])
         self.close()
 
     # Handles  the key press events for the whole dialog.
@@ -743,22 +1433,195 @@ class FindDialog(wx.Dialog):
     def onFindButtonClick(self, event):
         self.findTextAndClose()
 
+    # Handles the find all button click.
+    def onFindAllButtonClick(self, event):
+        self.findTextAndClose(True)
+
+
+# Filter output dialog class.
+class FilterDialog(wx.Dialog):
+
+    # Output streams the lines can be filtered by with their labels.
+    STREAMS = (
+        ("all", "All output"),
+        ("stdout", "Standard output"),
+        ("stderr", "Standard error output"),
+    )
+
+    # Initializes the object by linking it with the given AccessibleRunner and Config objects, binding the event handlers, and creating the GUI. The dialog is created once and shown by the show method.
+    def __init__(self, runner, config, title, parent=None):
+        super(FilterDialog, self).__init__(parent=parent, title=title)
+        self.parent = parent
+        self.runner = runner
+        self.config = config
+
+        self.Bind(wx.EVT_CHAR_HOOK, self.charHook)
+        self.Bind(wx.EVT_CLOSE, self.onWindowClose)
+
+        self.addWidgets()
+        self.Fit()
+        self.Centre()
+
+    # Sets the widget values from the current configuration and shows the dialog.
+    def show(self):
+        self.loadValues()
+        self.ShowModal()
+
+    # Adds all the initial widgets to this dialog.
+    def addWidgets(self):
+        self.panel = wx.Panel(self)
+        vbox = wx.BoxSizer(wx.VERTICAL)
+
+        # Filter text textbox
+        filterHbox = wx.BoxSizer(wx.HORIZONTAL)
+        filterLabel = wx.StaticText(self.panel, -1, "Show only lines matching")
+        filterHbox.Add(filterLabel, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5)
+        self.filterTextbox = wx.TextCtrl(self.panel)
+        filterHbox.Add(self.filterTextbox, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5)
+
+        # Ignore case checkbox
+        ignoreCaseHbox = wx.BoxSizer(wx.HORIZONTAL)
+        self.ignoreCaseCheckbox = wx.CheckBox(
+            self.panel, label="Ignore case", pos=(10, 10)
+        )
+        ignoreCaseHbox.Add(
+            self.ignoreCaseCheckbox, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5
+        )
+
+        # Regular expression checkbox
+        regexHbox = wx.BoxSizer(wx.HORIZONTAL)
+        self.regexCheckbox = wx.CheckBox(
+            self.panel, label="Regular expression", pos=(10, 10)
+        )
+        regexHbox.Add(self.regexCheckbox, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5)
+
+        # Stream choice
+        streamHbox = wx.BoxSizer(wx.HORIZONTAL)
+        streamLabel = wx.StaticText(self.panel, -1, "Stream")
+        streamHbox.Add(streamLabel, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5)
+        self.streamChoice = wx.Choice(
+            self.panel, choices=[label for stream, label in FilterDialog.STREAMS]
+        )
+        streamHbox.Add(self.streamChoice, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5)
+
+        filterButtonHbox = wx.BoxSizer(wx.HORIZONTAL)
+
+        # Filter button
+        self.filterButton = wx.Button(self.panel, label="Filter")
+        self.filterButton.SetDefault()
+        self.filterButton.Bind(wx.EVT_BUTTON, self.onFilterButtonClick)
+        filterButtonHbox.Add(
+            self.filterButton, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5
+        )
+
+        # Show all output button
+        self.showAllButton = wx.Button(self.panel, label="Show all output")
+        self.showAllButton.Bind(wx.EVT_BUTTON, self.onShowAllButtonClick)
+        filterButtonHbox.Add(
+            self.showAllButton, 1, wx.EXPAND | wx.ALIGN_LEFT | wx.ALL, 5
+        )
+
+        vbox.Add(filterHbox)
+        vbox.Add(ignoreCaseHbox)
+        vbox.Add(regexHbox)
+        vbox.Add(streamHbox)
+        vbox.Add(filterButtonHbox)
+
+        self.panel.SetSizer(vbox)
+
+    # Sets the widget values from the current settings.
+    def loadValues(self):
+        settings = self.config.settings
+        self.filterTextbox.SetValue(settings["filterText"])
+        self.ignoreCaseCheckbox.SetValue(settings["filterIgnoreCase"])
+        self.regexCheckbox.SetValue(settings["filterRegex"])
+        streams = [stream for stream, label in FilterDialog.STREAMS]
+        self.streamChoice.SetSelection(
+            streams.index(settings["filterStream"])
+            if settings["filterStream"] in streams
+            else 0
+        )
+        self.filterTextbox.SetFocus()
+        self.filterTextbox.SelectAll()
+
+    # Closes the dialog without any changes. The dialog is only hidden, so that it can be shown again.
+    def close(self):
+        self.EndModal(wx.ID_CLOSE)
+
+    # Handles the dialog window close event.
+    def onWindowClose(self, event):
+        self.close()
+
+    # Saves the filter text and the checkbox states, filters the output and closes the dialog. The dialog is not closed if the regular expression is invalid.
+    def filterAndClose(self):
+        settings = {
+            "filterText": self.filterTextbox.GetValue(),
+            "filterIgnoreCase": self.ignoreCaseCheckbox.GetValue(),
+            "filterRegex": self.regexCheckbox.GetValue(),
+            "filterStream": FilterDialog.STREAMS[self.streamChoice.GetSelection()][0],
+        }
+        if settings["filterRegex"]:
+            try:
+                compilePattern(settings["filterText"], True, False)
+            except re.error as e:
+                wx.MessageBox(
+                    "Invalid regular expression: {}".format(e),
+                    "Filter output",
+                    wx.OK | wx.ICON_ERROR,
+                    self,
+                )
+                self.filterTextbox.SetFocus()
+                return
+        self.runner.mergeSettings(settings)
+        self.parent.applyFilter()
+        self.close()
+
+    # Handles  the key press events for the whole dialog.
+    def charHook(self, event):
+        key = event.GetKeyCode()
+
+        # Escape
+        if key == wx.WXK_ESCAPE:
+            self.close()
+
+        # Enter
+        elif key == wx.WXK_RETURN:
+            self.filterAndClose()
+        else:
+            event.Skip()
+
+    # Handles the filter button click.
+    def onFilterButtonClick(self, event):
+        self.filterAndClose()
+
+    # Handles the show all output button click.
+    def onShowAllButtonClick(self, event):
+        if self.parent.filterOn:
+            self.parent.toggleFilter()
+        self.close()
+
 
 # Help HTML dialog class.
 class HelpHtmlDialog(wx.Dialog):
 
-    # Paths to Markdown pages directory and files
-    MARKDOWN_PATH = "md/"
-    HELP_PAGE_PATH = MARKDOWN_PATH + "help.md"
-
-    # Initializes the object by creating the HTML window, binding the event handlers and loading the HTML page.
+    # Initializes the object by creating the HTML window, binding the event handlers and loading the HTML page. The dialog is created once and shown by the show method.
     def __init__(self, title, parent=None):
         super(HelpHtmlDialog, self).__init__(parent=parent, title=title, size=(1000, 800))
 
         self.Bind(wx.EVT_CHAR_HOOK, self.charHook)
+        self.Bind(wx.EVT_CLOSE, self.onWindowClose)
 
         self.addWidgets()
         self.Centre()
+
+    # Shows the dialog with the page reloaded only if the help page has changed.
+    def show(self):
+        html = getHelpHTML()
+        if html is not self.html:
+            self.html = html
+            self.browser.SetPage(html, "")
+        else:
+            wx.CallAfter(self.clickToPage, None)
         self.ShowModal()
 
     # Adds all the initial widgets to this dialog.
@@ -766,11 +1629,12 @@ class HelpHtmlDialog(wx.Dialog):
         self.panel = wx.Panel(self)
         vbox = wx.BoxSizer(wx.VERTICAL)
 
-        # HTML browser containing the help page
+        # HTML browser containing the help page. The web view module is loaded only when the help is shown for the first time, as it slows down the start
+        import wx.html2
+
         self.browser = wx.html2.WebView.New(self.panel, backend=wx.html2.WebViewBackendEdge)
         self.browser.Bind(wx.html2.EVT_WEBVIEW_LOADED, self.clickToPage)
-        html = self.loadHTML()
-        self.browser.SetPage(html, "")
+        self.html = None
         vbox.Add(self.browser, 1, wx.EXPAND | wx.ALL, 5)
 
         # Close button
@@ -790,43 +1654,13 @@ class HelpHtmlDialog(wx.Dialog):
         robot.MouseClick()
         self.browser.SetFocus()
 
-    # Loads the page in Markdown, converts it into HTML and returns it.
-    def loadHTML(self):
-        path = HelpHtmlDialog.HELP_PAGE_PATH
-        content = ""
-        with open(path, encoding="utf-8") as file:
-            # Load file line by line
-            while True:
-                line = file.readline()
-                content += line
-                if not line:
-                    break
-
-        # Convert the page from Markkdown to HTML
-        md = markdown2.Markdown()
-        html = md.convert(content)
-
-        # Wrap the page content with the basic HTML structure and add the scrip which focuses the first element
-        html = (
-            """
-<!DOCTYPE html>
-<html lang="en">
-<head>
-<meta charset="UTF-8">
-</head>
-<body>
-"""
-            + html
-            + """
-</body>
-</html>
-"""
-        )
-        return html
-
-    # Closes the dialog.
+    # Closes the dialog. The dialog is only hidden, so that it can be shown again.
     def close(self):
-        self.Destroy()
+        self.EndModal(wx.ID_CLOSE)
+
+    # Handles the dialog window close event.
+    def onWindowClose(self, event):
+        self.close()
 
     # Handles  the key press events for the whole dialog.
     def charHook(self, event):
@@ -0,0 +1,79 @@
+import os
+
+# Paths to the help page in Markdown and its converted HTML
+HELP_PAGE_PATH = "md/help.md"
+HELP_HTML_PATH = "md/help.html"
+
+# First line of the converted HTML file with the modification time of the Markdown page it has been converted from
+STAMP_FORMAT = "<!-- source mtime: {} -->\n"
+
+# Converted help page HTML and the modification time of its Markdown page, kept for the application run
+cache = None
+
+
+# Returns the help page HTML. The page is converted from Markdown only if the Markdown page has changed since the last conversion: the HTML is cached in memory and in the HTML file next to the Markdown page, which is also generated at build time, so that showing the help does not need the conversion at all.
+def getHelpHTML():
+    global cache
+    mtime = int(os.path.getmtime(HELP_PAGE_PATH))
+    if cache is not None and cache[0] == mtime:
+        return cache[1]
+    html = readHTML(mtime)
+    if html is None:
+        html = convertPage()
+        writeHTML(html, mtime)
+    cache = (mtime, html)
+    return html
+
+
+# Returns the HTML from the HTML file if it has been converted from the Markdown page with the given modification time, otherwise None.
+def readHTML(mtime):
+    try:
+        with open(HELP_HTML_PATH, encoding="utf-8") as file:
+            if file.readline() != STAMP_FORMAT.format(mtime):
+                return None
+            return file.read()
+    except OSError:
+        return None
+
+
+# Saves the given HTML converted from the Markdown page with the given modification time to the HTML file. The file is not saved if the directory is not writable, e.g., in the program files.
+def writeHTML(html, mtime):
+    try:
+        with open(HELP_HTML_PATH, "w", encoding="utf-8") as file:
+            file.write(STAMP_FORMAT.format(mtime))
+            file.write(html)
+    except OSError:
+        pass
+
+
+# Loads the Markdown page, converts it into HTML and returns it.
+def convertPage():
+    with open(HELP_PAGE_PATH, encoding="utf-8") as file:
+        content = file.read()
+
+    # Convert the page from Markdown to HTML. The Markdown module is loaded only when the page is converted
+    import markdown2
+
+    html = markdown2.Markdown().convert(content)
+
+    # Wrap the page content with the basic HTML structure
+    return (
+        """
+<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="UTF-8">
+</head>
+<body>
+"""
+        + html
+        + """
+</body>
+</html>
+"""
+    )
+
+
+# Converts the help page at build time, so that the first showing of the help does not need the conversion.
+if __name__ == "__main__":
+    getHelpHTML()
@@ -0,0 +1,86 @@
+import math
+import time
+from bisect import bisect_left, insort
+
+# History class. Keeps the used items, e.g., commands or working directories, ranked by their frecency, which combines how often and how recently the item has been used: every use adds 1 to the item score and the score halves every HALF_LIFE seconds. The items are indexed by their rank and by their case folded text, so that adding an item, getting the best ranked items and completing a prefix do not go through the whole history.
+class History:
+
+    # Number of seconds after which the score of an unused item halves.
+    HALF_LIFE = 14 * 24 * 60 * 60
+
+    # Initializes the object with the given saved entries and the maximum number of items. Every entry is a list of the item, its score and the time of its last use, or only the item, in which case the entries are ranked by their order.
+    def __init__(self, entries=(), limit=1000):
+        self.limit = limit
+        self.entries = {}
+        self.ranked = []
+        self.keys = []
+        now = time.time()
+        for index, entry in enumerate(entries):
+            if isinstance(entry, str):
+                self.insert(entry, 1, now - index, True)
+            elif (
+                isinstance(entry, list)
+                and len(entry) == 3
+                and isinstance(entry[0], str)
+                and isinstance(entry[1], (int, float))
+                and isinstance(entry[2], (int, float))
+                and entry[1] > 0
+            ):
+                self.insert(entry[0], entry[1], entry[2], True)
+
+    # Returns the rank of an item with the given score and time of the last use. The rank is the logarithm of the score decayed to the time 0, so the ranks of the items do not change as the time goes.
+    @staticmethod
+    def getRank(score, lastUsed):
+        return math.log2(score) + lastUsed / History.HALF_LIFE
+
+    # Adds a use of the given item at the current time.
+    def add(self, item):
+        now = time.time()
+        score = 1
+        if item in self.entries:
+            oldScore, lastUsed, rank = self.entries[item]
+            score += oldScore * 2 ** ((lastUsed - now) / History.HALF_LIFE)
+        self.insert(item, score, now)
+
+    # Inserts the given item with the given score and time of the last use into the indexes, replacing the item if it exists. If the history is full, the worst ranked item is removed. Items loaded from the saved history do not replace the existing items, as the saved entries are ordered from the best ranked one.
+    def insert(self, item, score, lastUsed, loading=False):
+        if item in self.entries:
+            if loading:
+                return
+            self.remove(item)
+        rank = History.getRank(score, lastUsed)
+        self.entries[item] = (score, lastUsed, rank)
+        insort(self.ranked, (rank, item))
+        insort(self.keys, (item.casefold(), item))
+        while len(self.ranked) > self.limit:
+            self.remove(self.ranked[0][1])
+
+    # Removes the given item from the history.
+    def remove(self, item):
+        score, lastUsed, rank = self.entries.pop(item)
+        self.ranked.pop(bisect_left(self.ranked, (rank, item)))
+        self.keys.pop(bisect_left(self.keys, (item.casefold(), item)))
+
+    # Returns the given number of the best ranked items from the best one, or all the items if the count is None.
+    def getItems(self, count=None):
+        start = 0 if count is None else max(len(self.ranked) - count, 0)
+        return [item for rank, item in reversed(self.ranked[start:])]
+
+    # Returns the given number of the best ranked items starting with the given prefix, ignoring the case.
+    def complete(self, prefix, count):
+        key = prefix.casefold()
+        matches = []
+        index = bisect_left(self.keys, (key, ""))
+        while index < len(self.keys) and self.keys[index][0].startswith(key):
+            item = self.keys[index][1]
+            matches.append((self.entries[item][2], item))
+            index += 1
+        matches.sort(reverse=True)
+        return [item for rank, item in matches[:count]]
+
+    # Returns the history entries for saving, ordered from the best ranked item.
+    def toList(self):
+        return [
+            [item, self.entries[item][0], self.entries[item][1]]
+            for item in self.getItems()
+        ]
@@ -0,0 +1,132 @@
+import os
+import selectors
+import traceback
+from threading import Event, Lock, Thread
+
+ON_WINDOWS = os.name == "nt"
+
+# Pipe reading loop class. Reads the output pipes of all the running processes in a single thread and passes the read blocks to the registered callbacks, so that the number of threads does not grow with the number of processes. On Windows, where pipes cannot be waited for by the selectors, every pipe is read in its own thread instead, which is why the process sessions use the asyncio backend on Windows unless the threads backend is set explicitly.
+class PipeLoop:
+
+    # Number of bytes read from a pipe at once.
+    BLOCK_SIZE = 64 * 1024
+
+    # Shared loop instance
+    sharedLoop = None
+
+    # Returns the loop instance shared by all the process sessions, creating it on the first call.
+    @staticmethod
+    def shared():
+        if PipeLoop.sharedLoop is None:
+            PipeLoop.sharedLoop = PipeLoop()
+        return PipeLoop.sharedLoop
+
+    # Initializes the object. The loop thread is started when the first pipe is registered.
+    def __init__(self):
+        self.lock = Lock()
+        self.selector = None
+        self.thread = None
+        self.wakeReader = None
+        self.wakeWriter = None
+        self.paused = {}
+
+    # Registers the given binary pipe file object. The onData function is called with every block read from the pipe and the onClose function when the end of the pipe is reached. Both are called from the loop thread. The pipe can be paused and resumed using its file object.
+    def register(self, out, onData, onClose):
+        if ON_WINDOWS:
+            resumed = Event()
+            resumed.set()
+            with self.lock:
+                self.paused[out] = resumed
+            thread = Thread(target=self.readPipe, args=(out, onData, onClose, resumed))
+            thread.daemon = True  # Thread dies with the program
+            thread.start()
+            return
+
+        with self.lock:
+            if self.thread is None:
+                self.start()
+            self.selector.register(out.fileno(), selectors.EVENT_READ, (onData, onClose))
+
+        # Wake the loop up, so that it starts waiting for the new pipe
+        os.write(self.wakeWriter, b"\0")
+
+    # Stops reading the given registered pipe until it is resumed. Must be called from the loop thread, or from the pipe thread on Windows, e.g., from the onData function.
+    def pause(self, out):
+        with self.lock:
+            if ON_WINDOWS:
+                self.paused[out].clear()
+                return
+            key = self.selector.unregister(out.fileno())
+            self.paused[out] = key.data
+
+    # Continues reading the given paused pipe. Can be called from any thread. Does nothing if the pipe has been closed in the meantime.
+    def resume(self, out):
+        with self.lock:
+            if out not in self.paused:
+                return
+            if ON_WINDOWS:
+                self.paused[out].set()
+                return
+            self.selector.register(
+                out.fileno(), selectors.EVENT_READ, self.paused.pop(out)
+            )
+
+        # Wake the loop up, so that it starts waiting for the resumed pipe
+        os.write(self.wakeWriter, b"\0")
+
+    # Creates the selector and starts the loop thread. Must be called with the lock held.
+    def start(self):
+        self.selector = selectors.DefaultSelector()
+        self.wakeReader, self.wakeWriter = os.pipe()
+        self.selector.register(self.wakeReader, selectors.EVENT_READ, None)
+        self.thread = Thread(target=self.run)
+        self.thread.daemon = True  # Thread dies with the program
+        self.thread.start()
+
+    # Waits for the registered pipes to be readable and reads them forever. If reading a pipe or passing the read block fails, the pipe is closed as if its end has been reached, so that only the session of the pipe is affected.
+    def run(self):
+        while True:
+            with self.lock:
+                selector = self.selector
+            for key, events in selector.select():
+                if key.data is None:
+                    os.read(self.wakeReader, PipeLoop.BLOCK_SIZE)
+                    continue
+                onData, onClose = key.data
+                try:
+                    block = os.read(key.fd, PipeLoop.BLOCK_SIZE)
+                    if block:
+                        onData(block)
+                        continue
+                except Exception:
+                    traceback.print_exc()
+                self.unregister(key)
+                try:
+                    onClose()
+                except Exception:
+                    traceback.print_exc()
+
+    # Stops waiting for the pipe with the given selector key, whether it is paused or not.
+    def unregister(self, key):
+        with self.lock:
+            if key.fd in self.selector.get_map():
+                self.selector.unregister(key.fd)
+            for out, data in list(self.paused.items()):
+                if data is key.data:
+                    del self.paused[out]
+
+    # Reads the given pipe until its end in the current thread. Reading waits while the given resumed event is not set, i.e., while the pipe is paused. If reading the pipe or passing the read block fails, the pipe is closed as if its end has been reached.
+    def readPipe(self, out, onData, onClose, resumed):
+        fd = out.fileno()
+        try:
+            while True:
+                block = os.read(fd, PipeLoop.BLOCK_SIZE)
+                if not block:
+                    break
+                onData(block)
+                resumed.wait()
+        except Exception:
+            traceback.print_exc()
+        with self.lock:
+            del self.paused[out]
+        onClose()
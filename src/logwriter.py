@@ -0,0 +1,194 @@
+import importlib
+import os
+import re
+import shutil
+import time
+from queue import SimpleQueue
+from threading import Lock, Thread
+
+# Compression module names and file name suffixes by the compression name. The modules are imported when a log is compressed for the first time. Zstandard is in the standard library since Python 3.14 only.
+COMPRESSORS = {
+    "gzip": ("gzip", ".gz"),
+    "bz2": ("bz2", ".bz2"),
+    "xz": ("lzma", ".xz"),
+    "zstd": ("compression.zstd", ".zst"),
+}
+
+# Output log writer class. Tees the output of one process run to a log file on disk. The text is only collected by the write method, which never blocks on the disk, and it is written in bulk by a background worker thread shared by all the log writers. When the log file exceeds the maximum size or age, it is rotated: the current segment is renamed to "<name>.1.log", "<name>.2.log" etc. in the chronological order and compressed, and a new segment is started in "<name>.log". If the disk cannot keep up and the pending text exceeds the limit, the new text is dropped and a note about it is written to the log.
+class LogWriter:
+
+    # Maximum number of pending characters per log writer.
+    MAX_PENDING = 16 * 1024 * 1024
+
+    # Size of the log file write buffer in bytes.
+    BUFFER_SIZE = 256 * 1024
+
+    # Maximum number of characters of the command used in the log file name.
+    MAX_NAME_LENGTH = 40
+
+    # Worker thread queue of the log writers with pending work
+    queue = None
+
+    # Lock guarding the worker thread start
+    workerLock = Lock()
+
+    # Initializes the object for writing to the given log file path. The file is rotated when it has more than maxBytes bytes or after it has been written for maxSeconds seconds, 0 disables the respective rotation. Rotated segments are compressed using the given compression, see COMPRESSORS, or not at all if it is unknown, e.g., "none".
+    def __init__(self, path, maxBytes=0, maxSeconds=0, compression="none"):
+        self.path = path
+        self.maxBytes = maxBytes
+        self.maxSeconds = maxSeconds
+        self.compression = compression
+        self.lock = Lock()
+        self.pending = []
+        self.pendingLength = 0
+        self.dropped = 0
+        self.scheduled = False
+        self.closing = False
+        self.error = None
+        self.file = None
+        self.segmentBytes = 0
+        self.segmentStart = 0
+        self.segmentCount = 0
+
+    # Returns a new log writer for the given command with a log file in the given directory named by the current time and the command. The other arguments are passed to the constructor.
+    @staticmethod
+    def create(directory, command, *args):
+        if not isinstance(command, str):
+            command = " ".join(command)
+        name = re.sub(r"[^\w.-]+", "_", command)[: LogWriter.MAX_NAME_LENGTH]
+        name = name.strip("_.") or "command"
+        base = os.path.join(
+            directory, "{}-{}".format(time.strftime("%Y%m%d-%H%M%S"), name)
+        )
+        path = base + ".log"
+        number = 2
+        while os.path.exists(path):
+            path = "{}-{}.log".format(base, number)
+            number += 1
+        return LogWriter(path, *args)
+
+    # Adds the given text to be written to the log. Safe to be called from any thread, never waits for the disk.
+    def write(self, text):
+        with self.lock:
+            if self.closing or self.error is not None:
+                return
+            if self.pendingLength >= LogWriter.MAX_PENDING:
+                self.dropped += len(text)
+                return
+            self.pending.append(text)
+            self.pendingLength += len(text)
+            if self.scheduled:
+                return
+            self.scheduled = True
+        LogWriter.schedule(self)
+
+    # Closes the log after all the pending text is written. Safe to be called from any thread.
+    def close(self):
+        with self.lock:
+            self.closing = True
+            if self.scheduled:
+                return
+            self.scheduled = True
+        LogWriter.schedule(self)
+
+    # Adds the given log writer to the worker queue, starting the worker thread on the first call.
+    @staticmethod
+    def schedule(writer):
+        with LogWriter.workerLock:
+            if LogWriter.queue is None:
+                LogWriter.queue = SimpleQueue()
+                thread = Thread(target=LogWriter.runWorker, args=(LogWriter.queue,))
+                thread.daemon = True  # Thread dies with the program
+                thread.start()
+        LogWriter.queue.put(writer)
+
+    # Writes the pending text of the log writers from the given queue forever.
+    @staticmethod
+    def runWorker(queue):
+        while True:
+            queue.get().drain()
+
+    # Writes all the pending text to the log file at once and closes the file if the log is being closed. Runs in the worker thread.
+    def drain(self):
+        with self.lock:
+            pending = self.pending
+            dropped = self.dropped
+            closing = self.closing
+            self.pending = []
+            self.pendingLength = 0
+            self.dropped = 0
+            self.scheduled = False
+        try:
+            if dropped:
+                pending.append(
+                    "[{} characters of output not logged, the disk is too slow]\n".format(
+                        dropped
+                    )
+                )
+            if pending:
+                self.writeSegment("".join(pending).encode("utf-8", "replace"))
+            if closing:
+                self.closeFile()
+            elif self.file is not None:
+                self.file.flush()
+        except OSError as e:
+            with self.lock:
+                self.error = e
+                self.pending = []
+                self.pendingLength = 0
+            self.closeFile()
+
+    # Writes the given bytes to the current log segment, rotating the log first if the segment is too large or too old.
+    def writeSegment(self, data):
+        if self.file is None:
+            self.openSegment()
+        elif self.segmentBytes > 0 and (
+            (self.maxBytes > 0 and self.segmentBytes + len(data) > self.maxBytes)
+            or (
+                self.maxSeconds > 0
+                and time.monotonic() - self.segmentStart >= self.maxSeconds
+            )
+        ):
+            self.rotate()
+        self.file.write(data)
+        self.segmentBytes += len(data)
+
+    # Opens a new log segment at the log path.
+    def openSegment(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.file = open(self.path, "wb", buffering=LogWriter.BUFFER_SIZE)
+        self.segmentBytes = 0
+        self.segmentStart = time.monotonic()
+
+    # Closes the current log segment, renames and compresses it, and opens a new segment.
+    def rotate(self):
+        self.closeFile()
+        self.segmentCount += 1
+        root, extension = os.path.splitext(self.path)
+        rotatedPath = "{}.{}{}".format(root, self.segmentCount, extension)
+        os.replace(self.path, rotatedPath)
+        self.compress(rotatedPath)
+        self.openSegment()
+
+    # Compresses the file at the given path using the log compression and removes the uncompressed file. The file is kept uncompressed if the compression is not available.
+    def compress(self, path):
+        if self.compression not in COMPRESSORS:
+            return
+        moduleName, suffix = COMPRESSORS[self.compression]
+        try:
+            module = importlib.import_module(moduleName)
+        except ImportError:
+            return
+        with open(path, "rb") as source, module.open(path + suffix, "wb") as target:
+            shutil.copyfileobj(source, target, LogWriter.BUFFER_SIZE)
+        os.remove(path)
+
+    # Closes the current log segment file, if any.
+    def closeFile(self):
+        if self.file is None:
+            return
+        try:
+            self.file.close()
+        except OSError:
+            pass
+        self.file = None
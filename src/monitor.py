@@ -0,0 +1,226 @@
+import time
+from array import array
+from threading import Condition, Lock, Thread
+
+# Units of the formatted byte counts.
+BYTE_UNITS = ("bytes", "KB", "MB", "GB", "TB")
+
+
+# Returns the given number of bytes formatted for reading with a unit, e.g., "12.3 MB".
+def formatBytes(count):
+    unit = 0
+    while count >= 1024 and unit < len(BYTE_UNITS) - 1:
+        count /= 1024
+        unit += 1
+    if unit == 0:
+        return "{:.0f} {}".format(count, BYTE_UNITS[unit])
+    return "{:.1f} {}".format(count, BYTE_UNITS[unit])
+
+
+# Resource monitor class. Samples the CPU usage, memory, I/O and the thread and child process counts of a process tree at a fixed interval and keeps the samples in a ring buffer of a fixed capacity. The figures of the whole tree are summed. The samples are taken by the resource sampler thread shared by all the monitors. The processes of the tree are cached between the samples, so that their CPU usage can be measured without waiting and their static information is not read again.
+class ResourceMonitor:
+
+    # Sample fields in the order they are stored in the ring buffer.
+    FIELDS = ("time", "cpu", "rss", "readBytes", "writeBytes", "threads", "children")
+
+    # Initializes the object with the given sampling interval in seconds and the maximum number of kept samples.
+    def __init__(self, interval=1, capacity=3600):
+        self.interval = interval
+        self.capacity = max(capacity, 1)
+        self.samples = array("d", bytes(8 * len(self.FIELDS) * self.capacity))
+        self.count = 0
+        self.peaks = dict.fromkeys(self.FIELDS, 0)
+        self.lock = Lock()
+        self.pid = None
+        self.processes = {}
+        self.generation = 0
+        self.nextTime = 0
+
+    # Starts sampling the process with the given ID and its child processes. The samples of the previous process are discarded.
+    def start(self, pid):
+        with self.lock:
+            self.count = 0
+            self.peaks = dict.fromkeys(self.FIELDS, 0)
+            self.pid = pid
+            self.processes = {}
+            self.generation += 1
+            self.nextTime = 0
+        ResourceSampler.shared().add(self)
+
+    # Stops sampling. The samples are kept.
+    def stop(self):
+        with self.lock:
+            self.pid = None
+            self.generation += 1
+
+    # Returns True if the monitor samples a process.
+    def isRunning(self):
+        return self.pid is not None
+
+    # Takes a sample of the monitored process tree using the given psutil module and the given dictionary of the child process IDs by the IDs of all the running processes, and schedules the next sample. Stops sampling if the process has ended. Called from the resource sampler thread.
+    def sample(self, psutil, children):
+        with self.lock:
+            pid = self.pid
+            processes = self.processes
+            generation = self.generation
+        if pid is None:
+            return
+        if pid not in children:
+            with self.lock:
+                if self.generation == generation:
+                    self.pid = None
+            return
+        tree = []
+        pids = [pid]
+        while pids:
+            pid = pids.pop()
+            tree.append(pid)
+            pids.extend(children[pid])
+        sample = self.sampleTree(psutil, tree, processes)
+
+        # Discard the sample if the monitor has been stopped or restarted meanwhile
+        with self.lock:
+            if self.generation != generation:
+                return
+            self.addSample(sample)
+
+            # Align the next sample to the multiples of the interval, so that the monitors with the same interval are sampled in the same tick
+            self.nextTime = (time.monotonic() // self.interval + 1) * self.interval
+
+    # Returns the sample of the processes of a process tree with the given IDs as a tuple of the field values. The given dictionary of the process objects of the previous sample by their IDs is updated to the current processes.
+    def sampleTree(self, psutil, tree, processes):
+        cpu = rss = readBytes = writeBytes = threads = 0
+        sampled = {}
+        for pid in tree:
+            try:
+                # Reuse the cached process object, which remembers the CPU times of the previous sample
+                process = processes.get(pid)
+                if process is None:
+                    process = psutil.Process(pid)
+                with process.oneshot():
+                    cpu += process.cpu_percent()
+                    rss += process.memory_info().rss
+                    threads += process.num_threads()
+                    if hasattr(process, "io_counters"):
+                        io = process.io_counters()
+                        readBytes += io.read_bytes
+                        writeBytes += io.write_bytes
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+            sampled[process.pid] = process
+        processes.clear()
+        processes.update(sampled)
+        return (time.time(), cpu, rss, readBytes, writeBytes, threads, len(tree) - 1)
+
+    # Adds the given sample to the ring buffer, overwriting the oldest sample if the buffer is full, and updates the peaks. Must be called with the lock held.
+    def addSample(self, sample):
+        fieldCount = len(self.FIELDS)
+        start = (self.count % self.capacity) * fieldCount
+        self.samples[start : start + fieldCount] = array("d", sample)
+        self.count += 1
+        for field, value in zip(self.FIELDS, sample):
+            if value > self.peaks[field]:
+                self.peaks[field] = value
+
+    # Returns the latest sample as a dictionary by the field names, or None if there is no sample.
+    def getLatest(self):
+        with self.lock:
+            if self.count == 0:
+                return None
+            fieldCount = len(self.FIELDS)
+            start = ((self.count - 1) % self.capacity) * fieldCount
+            return dict(zip(self.FIELDS, self.samples[start : start + fieldCount]))
+
+    # Returns the peak values of all the samples, including the overwritten ones, as a dictionary by the field names.
+    def getPeaks(self):
+        with self.lock:
+            return dict(self.peaks)
+
+    # Returns the kept samples from the oldest one as a list of dictionaries by the field names.
+    def getSamples(self):
+        fieldCount = len(self.FIELDS)
+        samples = []
+        with self.lock:
+            for index in range(max(self.count - self.capacity, 0), self.count):
+                start = (index % self.capacity) * fieldCount
+                samples.append(
+                    dict(zip(self.FIELDS, self.samples[start : start + fieldCount]))
+                )
+        return samples
+
+
+# Resource sampler class. Takes the samples of all the running resource monitors in a single thread, so that the number of threads does not grow with the number of processes. Every tick reads the parent process IDs of all the running processes once, samples the trees of the monitors whose interval has elapsed and then waits for the nearest next sample. The psutil module is imported in the sampler thread, so that it does not slow down the application start. The CPU time spent by the sampler thread is counted, so that the monitoring cost can be measured.
+class ResourceSampler:
+
+    # Shared sampler instance
+    sharedSampler = None
+
+    # Returns the sampler instance shared by all the resource monitors, creating it on the first call.
+    @staticmethod
+    def shared():
+        if ResourceSampler.sharedSampler is None:
+            ResourceSampler.sharedSampler = ResourceSampler()
+        return ResourceSampler.sharedSampler
+
+    # Initializes the object. The sampler thread is started when the first monitor is added.
+    def __init__(self):
+        self.condition = Condition()
+        self.monitors = []
+        self.thread = None
+        self.cpuSeconds = 0
+
+    # Adds the given started monitor to the sampled monitors and wakes the sampler up, so that the first sample is taken immediately. Stopped monitors are removed by the sampler.
+    def add(self, monitor):
+        with self.condition:
+            if self.thread is None:
+                self.thread = Thread(target=self.run)
+                self.thread.daemon = True  # Thread dies with the program
+                self.thread.start()
+            if monitor not in self.monitors:
+                self.monitors.append(monitor)
+            self.condition.notify()
+
+    # Returns the number of seconds of CPU time spent by the sampler thread.
+    def getCpuSeconds(self):
+        with self.condition:
+            return self.cpuSeconds
+
+    # Samples the monitors forever.
+    def run(self):
+        import psutil
+
+        while True:
+            with self.condition:
+                self.monitors = [
+                    monitor for monitor in self.monitors if monitor.isRunning()
+                ]
+                if not self.monitors:
+                    self.condition.wait()
+                    continue
+                now = time.monotonic()
+                due = [monitor for monitor in self.monitors if monitor.nextTime <= now]
+                if not due:
+                    nextTime = min(monitor.nextTime for monitor in self.monitors)
+                    self.condition.wait(nextTime - now)
+                    continue
+            start = time.thread_time()
+            children = self.getChildren(psutil)
+            for monitor in due:
+                monitor.sample(psutil, children)
+            with self.condition:
+                self.cpuSeconds += time.thread_time() - start
+
+    # Returns the dictionary of the child process IDs by the IDs of all the running processes using the given psutil module. Processes created before their parent are not its children, as their parent has ended and its ID has been reused.
+    def getChildren(self, psutil):
+        table = {}
+        for process in psutil.process_iter():
+            try:
+                table[process.pid] = (process.ppid(), process.create_time())
+            except psutil.Error:
+                continue
+        children = {pid: [] for pid in table}
+        for pid, (ppid, createTime) in table.items():
+            parent = table.get(ppid)
+            if parent is not None and pid != ppid and createTime >= parent[1]:
+                children[ppid].append(pid)
+        return children
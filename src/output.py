@@ -0,0 +1,374 @@
+from array import array
+from bisect import bisect_right
+import mmap
+import tempfile
+from threading import Lock
+
+# Output line index class. Holds the start positions of all the lines in the order they have been appended in compact arrays, so that the line at a position is found by binary search and the position of a line is found directly. The arrival time and the flags of every line are held in parallel arrays, taking 17 bytes per line. The lines are indexed in pages of PAGE_SIZE lines, and the full pages whose lines all start in the output which has been spilled from memory are spilled to a temporary file too and read back when needed, so that the memory used by the index is bounded by the output kept in memory.
+class LineIndex:
+
+    # Line flag of the lines read from the standard error output.
+    STDERR = 1
+
+    # Line flag of the lines matching the success regular expression.
+    SUCCESS = 2
+
+    # Line flag of the lines matching the error regular expression.
+    ERROR = 4
+
+    # Number of lines in one page of the index.
+    PAGE_SIZE = 64 * 1024
+
+    # Initializes the object as an index of a single empty line.
+    def __init__(self):
+        self.lock = Lock()
+        self.spillFile = None
+        self.clear()
+
+    # Removes all the lines from the index except the first empty one.
+    def clear(self):
+        with self.lock:
+            self.pages = [LineIndex.createPage(0, 0, 0)]
+            self.pageStarts = array("q", [0])
+            self.spillOffsets = []
+            self.cachedPage = (-1, None)
+            if self.spillFile is not None:
+                self.spillFile.seek(0)
+                self.spillFile.truncate()
+
+    # Returns a new page as a tuple of the start, time and flags arrays with a line starting at the given position with the given arrival time and flags.
+    @staticmethod
+    def createPage(start, time, flags):
+        return (array("q", [start]), array("d", [time]), array("B", [flags]))
+
+    # Indexes the given text appended at the given position with the given arrival time and line flags. The time and flags are set to the line which the text starts if it is empty and to all the lines started by the text.
+    def append(self, text, position, time=0, flags=0):
+        with self.lock:
+            starts, times, flagArray = self.pages[-1]
+            if position == starts[-1]:
+                times[-1] = time
+                flagArray[-1] = flags
+            index = text.find("\n")
+            while index >= 0:
+                start = position + index + 1
+                if len(starts) == LineIndex.PAGE_SIZE:
+                    self.pages.append(LineIndex.createPage(start, time, flags))
+                    self.pageStarts.append(start)
+                    starts, times, flagArray = self.pages[-1]
+                else:
+                    starts.append(start)
+                    times.append(time)
+                    flagArray.append(flags)
+                index = text.find("\n", index + 1)
+
+    # Spills the full pages of the lines which all start before the given position, i.e., in the output spilled from memory, to the spill file.
+    def spill(self, position):
+        with self.lock:
+            index = len(self.spillOffsets)
+            while index + 1 < len(self.pages) and self.pageStarts[index + 1] <= position:
+                if self.spillFile is None:
+                    self.spillFile = tempfile.TemporaryFile(prefix="AccessibleRunner-")
+                self.spillFile.seek(0, 2)
+                self.spillOffsets.append(self.spillFile.tell())
+                for values in self.pages[index]:
+                    self.spillFile.write(values.tobytes())
+                self.pages[index] = None
+                index += 1
+
+    # Returns the page with the given index, reading it from the spill file if it has been spilled. The last read page is cached. Must be called with the lock held.
+    def getPage(self, index):
+        page = self.pages[index]
+        if page is not None:
+            return page
+        if self.cachedPage[0] == index:
+            return self.cachedPage[1]
+        size = LineIndex.PAGE_SIZE
+        self.spillFile.seek(self.spillOffsets[index])
+        page = (array("q"), array("d"), array("B"))
+        page[0].frombytes(self.spillFile.read(8 * size))
+        page[1].frombytes(self.spillFile.read(8 * size))
+        page[2].frombytes(self.spillFile.read(size))
+        self.cachedPage = (index, page)
+        return page
+
+    # Returns the value with the given index of the start, time and flags arrays of the line with the given zero based number.
+    def getValue(self, number, valueIndex):
+        with self.lock:
+            page, offset = divmod(number, LineIndex.PAGE_SIZE)
+            return self.getPage(page)[valueIndex][offset]
+
+    # Returns the number of lines, including the last line which may be empty.
+    def getCount(self):
+        with self.lock:
+            return (len(self.pages) - 1) * LineIndex.PAGE_SIZE + len(self.pages[-1][0])
+
+    # Returns the zero based number of the line containing the given position.
+    def getLineNumber(self, position):
+        with self.lock:
+            page = max(bisect_right(self.pageStarts, position) - 1, 0)
+            starts = self.getPage(page)[0]
+            return page * LineIndex.PAGE_SIZE + max(bisect_right(starts, position) - 1, 0)
+
+    # Returns the start position of the line with the given zero based number.
+    def getStart(self, number):
+        return self.getValue(number, 0)
+
+    # Returns the arrival time in seconds since the epoch of the line with the given zero based number.
+    def getTime(self, number):
+        return self.getValue(number, 1)
+
+    # Returns the flags of the line with the given zero based number.
+    def getFlags(self, number):
+        return self.getValue(number, 2)
+
+    # Returns the end position, i.e., the position of the new line, of the line with the given zero based number. The given text length is returned for the last line.
+    def getEnd(self, number, length):
+        if number + 1 < self.getCount():
+            return self.getStart(number + 1) - 1
+        return length
+
+
+# Append-only command output buffer class. The text is stored in sealed chunks of roughly the same size plus a list of pending pieces, so appending a line never copies the text which has already been stored. If a memory limit is given, the oldest sealed chunks exceeding it are spilled to a temporary file and read back through a memory map when needed, and so are the pages of the line index of the spilled text.
+class OutputBuffer:
+
+    # Default size of one sealed chunk in characters.
+    CHUNK_SIZE = 64 * 1024
+
+    # Initializes the object as an empty buffer with the given chunk size and the given maximum number of characters kept in memory, or no limit if None. If indexLines is True, the lines of the buffer are indexed.
+    def __init__(self, chunkSize=CHUNK_SIZE, memoryLimit=None, indexLines=True):
+        self.chunkSize = chunkSize
+        self.memoryLimit = memoryLimit
+        self.lock = Lock()
+        self.lines = LineIndex() if indexLines else None
+        self.spillFile = None
+        self.spillMap = None
+        self.clear()
+
+    # Removes all the text from the buffer.
+    def clear(self):
+        with self.lock:
+            self.chunks = []
+            self.chunkStarts = []
+            self.pieces = []
+            self.piecesLength = 0
+            self.length = 0
+            if self.lines is not None:
+                self.lines.clear()
+
+            # Forget the spilled chunks and empty the spill file
+            self.spillSpans = []
+            self.spilledLength = 0
+            if self.spillMap is not None:
+                self.spillMap.close()
+                self.spillMap = None
+            if self.spillFile is not None:
+                self.spillFile.seek(0)
+                self.spillFile.truncate()
+
+    # Sets the maximum number of characters kept in memory, or no limit if None.
+    def setMemoryLimit(self, memoryLimit):
+        with self.lock:
+            self.memoryLimit = memoryLimit
+            self.spill()
+
+    # Appends the given text to the end of the buffer. The given arrival time and line flags, see LineIndex, are recorded for the lines of the text.
+    def append(self, text, time=0, flags=0):
+        if not text:
+            return
+        with self.lock:
+            if self.lines is not None:
+                self.lines.append(text, self.length, time, flags)
+            self.pieces.append(text)
+            self.piecesLength += len(text)
+            self.length += len(text)
+
+            # Seal the pending pieces into a new chunk once they are large enough
+            if self.piecesLength >= self.chunkSize:
+                self.seal()
+
+    # Joins the pending pieces into a sealed chunk. The pieces are added to the last chunk if it is still smaller than the chunk size, so that reading the buffer often does not leave many small chunks. Must be called with the lock held.
+    def seal(self):
+        if not self.pieces:
+            return
+        text = "".join(self.pieces)
+        if self.chunks and len(self.chunks[-1]) < self.chunkSize:
+            self.chunks[-1] += text
+        else:
+            self.chunkStarts.append(self.length - self.piecesLength)
+            self.chunks.append(text)
+        self.pieces = []
+        self.piecesLength = 0
+        self.spill()
+
+    # Writes the oldest chunks in memory to the spill file while the memory limit is exceeded. The last chunk is always kept in memory. Must be called with the lock held.
+    def spill(self):
+        if self.memoryLimit is None:
+            return
+        while (
+            self.length - self.spilledLength > self.memoryLimit
+            and len(self.spillSpans) < len(self.chunks) - 1
+        ):
+            if self.spillFile is None:
+                self.spillFile = tempfile.TemporaryFile(prefix="AccessibleRunner-")
+            index = len(self.spillSpans)
+            data = self.chunks[index].encode("utf-8", "surrogatepass")
+            self.spillFile.seek(0, 2)
+            self.spillSpans.append((self.spillFile.tell(), len(data)))
+            self.spillFile.write(data)
+            self.spilledLength += len(self.chunks[index])
+            self.chunks[index] = None
+        if self.lines is not None:
+            self.lines.spill(self.spilledLength)
+
+    # Returns the text of the chunk with the given index, reading it from the spill file if it has been spilled. Must be called with the lock held.
+    def getChunk(self, index):
+        chunk = self.chunks[index]
+        if chunk is not None:
+            return chunk
+        offset, size = self.spillSpans[index]
+
+        # Map the spill file again if it has grown since it was mapped
+        if self.spillMap is None or len(self.spillMap) < offset + size:
+            if self.spillMap is not None:
+                self.spillMap.close()
+            self.spillFile.flush()
+            self.spillMap = mmap.mmap(
+                self.spillFile.fileno(), 0, access=mmap.ACCESS_READ
+            )
+        return self.spillMap[offset : offset + size].decode("utf-8", "surrogatepass")
+
+    # Returns the number of characters in the buffer.
+    def getLength(self):
+        return self.length
+
+    # Returns the number of lines in the buffer, including the last line which may be empty.
+    def getLineCount(self):
+        return self.lines.getCount()
+
+    # Returns the zero based number of the line containing the given position.
+    def getLineNumber(self, position):
+        return self.lines.getLineNumber(position)
+
+    # Returns the start position of the line with the given zero based number.
+    def getLineStart(self, number):
+        return self.lines.getStart(number)
+
+    # Returns the arrival time in seconds since the epoch of the line with the given zero based number.
+    def getLineTime(self, number):
+        return self.lines.getTime(number)
+
+    # Returns the flags of the line with the given zero based number.
+    def getLineFlags(self, number):
+        return self.lines.getFlags(number)
+
+    # Returns the line with the given zero based number without the line ending.
+    def getLine(self, number):
+        with self.lock:
+            self.seal()
+            start = self.lines.getStart(number)
+            end = self.lines.getEnd(number, self.length)
+            return self.readRange(start, end)
+
+    # Returns the line containing the given position without the line ending.
+    def getLineAt(self, position):
+        return self.getLine(self.lines.getLineNumber(position))
+
+    # Returns the whole text of the buffer.
+    def getText(self):
+        with self.lock:
+            self.seal()
+            return "".join(self.getChunk(i) for i in range(len(self.chunks)))
+
+    # Returns the text between the given start and end positions of the buffer.
+    def getRange(self, start, end=None):
+        with self.lock:
+            self.seal()
+            return self.readRange(start, end)
+
+    # Returns the text between the given start and end positions of the buffer. Must be called with the lock held and with all the pieces sealed.
+    def readRange(self, start, end=None):
+        if end is None or end > self.length:
+            end = self.length
+        start = max(start, 0)
+        if start >= end:
+            return ""
+
+        # Find the chunk containing the start position and collect the chunks until the end position
+        index = bisect_right(self.chunkStarts, start) - 1
+        parts = []
+        while index < len(self.chunks) and self.chunkStarts[index] < end:
+            chunkStart = self.chunkStarts[index]
+            chunk = self.getChunk(index)
+            parts.append(chunk[max(start - chunkStart, 0) : end - chunkStart])
+            index += 1
+        return "".join(parts)
+
+    # Returns the lowest position of the given text found entirely between the given start and end positions, or -1 if the text is not found. The chunks are searched one by one, so the whole text of the buffer is never copied.
+    def find(self, text, start=0, end=None):
+        with self.lock:
+            self.seal()
+            if end is None or end > self.length:
+                end = self.length
+            start = max(start, 0)
+            length = len(text)
+            if length == 0 or start + length > end:
+                return -1
+
+            index = bisect_right(self.chunkStarts, start) - 1
+            while index < len(self.chunks) and self.chunkStarts[index] < end:
+                chunkStart = self.chunkStarts[index]
+                chunk = self.getChunk(index)
+                position = chunk.find(text, max(start - chunkStart, 0), end - chunkStart)
+                if position >= 0:
+                    return chunkStart + position
+
+                # Search for the text crossing the boundary with the next chunk
+                chunkEnd = chunkStart + len(chunk)
+                if length > 1 and chunkEnd < end:
+                    boundaryStart = max(chunkEnd - length + 1, start, chunkStart)
+                    boundary = self.readRange(
+                        boundaryStart, min(chunkEnd + length - 1, end)
+                    )
+                    position = boundary.find(text)
+                    if position >= 0:
+                        return boundaryStart + position
+                index += 1
+            return -1
+
+    # Returns the highest position of the given text found entirely between the given start and end positions, or -1 if the text is not found. The chunks are searched one by one from the end, so the whole text of the buffer is never copied.
+    def rfind(self, text, start=0, end=None):
+        with self.lock:
+            self.seal()
+            if end is None or end > self.length:
+                end = self.length
+            start = max(start, 0)
+            length = len(text)
+            if length == 0 or start + length > end:
+                return -1
+
+            index = bisect_right(self.chunkStarts, end - 1) - 1
+            while index >= 0:
+                chunkStart = self.chunkStarts[index]
+                chunk = self.getChunk(index)
+                chunkEnd = chunkStart + len(chunk)
+                if chunkEnd <= start:
+                    break
+
+                # Search for the text crossing the boundary with the next chunk, starting in this chunk
+                if length > 1 and chunkEnd < end:
+                    boundaryStart = max(chunkEnd - length + 1, start, chunkStart)
+                    boundary = self.readRange(
+                        boundaryStart, min(chunkEnd + length - 1, end)
+                    )
+                    position = boundary.rfind(
+                        text, 0, chunkEnd - boundaryStart + length - 1
+                    )
+                    if position >= 0:
+                        return boundaryStart + position
+
+                position = chunk.rfind(text, max(start - chunkStart, 0), end - chunkStart)
+                if position >= 0:
+                    return chunkStart + position
+                index -= 1
+            return -1
+
@@ -0,0 +1,259 @@
+import struct
+import tempfile
+from collections import deque
+from threading import Condition, Lock, Thread
+
+# Output queue class. Passes the blocks read from the output pipes of a process to the consumer thread which decodes and processes them, so that reading the pipes does not wait for the processing. The queue holds at most the given number of bytes in memory. What happens when it is full depends on the policy:
+# * "block": the block is queued, but the pipe it has been read from is paused until the queue has room again, so the process waits when the pipe fills up,
+# * "drop": the block is dropped and the number of the dropped bytes is reported with the next queued block, so that it is reported where the output is missing,
+# * "spill": the block is written to a temporary file and read back when the blocks before it have been processed. If the file cannot be written or read, e.g., because the disk is full, the spilled blocks are dropped and the policy falls back to "drop".
+# The end of a pipe is queued as a block of None, which is never dropped. The queue is scheduled in the consumer when a block is queued, so that the queues of all the running processes are processed by a single thread.
+class OutputQueue:
+
+    # Queue policies
+    POLICIES = ("block", "drop", "spill")
+
+    # Maximum number of bytes of the consecutive blocks of the same pipe joined into one block by the get method.
+    JOIN_SIZE = 256 * 1024
+
+    # Header of a spilled block with the standard error output flag and the block length, which is -1 for the end of a pipe
+    SPILL_HEADER = struct.Struct("<?i")
+
+    # Initializes the object with the given maximum number of bytes held in memory, the given policy and the given function processing the queued blocks, which is called from the thread of the given consumer with the queue, the block, its standard error output flag and the number of the bytes dropped before it. The given onError function is called from the consumer thread with the queue and the exception when processing a block fails. The shared consumer is used if no consumer is given. Unknown policies are treated as "spill", which never waits and never loses output.
+    def __init__(self, maxBytes, policy, onBlock, consumer=None, onError=None):
+        self.maxBytes = max(maxBytes, 1)
+        self.policy = policy if policy in OutputQueue.POLICIES else "spill"
+        self.onBlock = onBlock
+        self.onError = onError
+        self.consumer = consumer if consumer is not None else OutputConsumer.shared()
+        self.lock = Lock()
+        self.scheduled = False
+        self.blocks = deque()
+        self.size = 0
+        self.dropped = 0
+        self.resumes = []
+        self.spillFile = None
+        self.spillReadPosition = 0
+        self.spillWritePosition = 0
+        self.spilledBytes = 0
+        self.spilledEnds = []
+
+    # Returns True if the queue holds at least the maximum number of bytes in memory. Must be called with the lock held.
+    def isFull(self):
+        return self.size >= self.maxBytes
+
+    # Queues the given block read from the standard output or, if isStderr is True, the standard error output. Never waits for the processing. If the queue is full and the policy is "block", the given pause function is called and the given resume function is called when the queue has room again, both with the pause function called first. The end of the pipe is queued by a block of None.
+    def put(self, block, isStderr, pause=None, resume=None):
+        with self.lock:
+            if self.spillReadPosition < self.spillWritePosition:
+                # Keep the order of the blocks while there are spilled blocks
+                self.trySpill(block, isStderr)
+            elif block is not None and self.isFull() and self.policy != "block":
+                if self.policy == "drop":
+                    self.dropped += len(block)
+                    return
+                self.trySpill(block, isStderr)
+            else:
+                self.blocks.append((block, isStderr, self.dropped))
+                self.dropped = 0
+                if block is not None:
+                    self.size += len(block)
+                if self.isFull() and self.policy == "block" and pause is not None:
+                    pause()
+                    self.resumes.append(resume)
+            schedule = not self.scheduled
+            self.scheduled = True
+        if schedule:
+            self.consumer.schedule(self)
+
+    # Writes the given block to the end of the spill file, creating the file if needed. Must be called with the lock held.
+    def spill(self, block, isStderr):
+        if self.spillFile is None:
+            self.spillFile = tempfile.TemporaryFile(buffering=0)
+        length = -1 if block is None else len(block)
+        self.spillFile.seek(self.spillWritePosition)
+        self.spillFile.write(OutputQueue.SPILL_HEADER.pack(isStderr, length))
+        if block is not None:
+            self.spillFile.write(block)
+        self.spillWritePosition = self.spillFile.tell()
+        if block is None:
+            self.spilledEnds.append(isStderr)
+        else:
+            self.spilledBytes += len(block)
+
+    # Writes the given block to the spill file like the spill method. If the file cannot be written, the spilled blocks are dropped, see the dropSpilled method, and the block is queued in memory if it is the end of a pipe or dropped otherwise. Must be called with the lock held.
+    def trySpill(self, block, isStderr):
+        try:
+            self.spill(block, isStderr)
+            return
+        except OSError:
+            self.dropSpilled()
+        if block is None:
+            self.blocks.append((None, isStderr, self.dropped))
+            self.dropped = 0
+        else:
+            self.dropped += len(block)
+
+    # Drops all the spilled blocks after the spill file has failed and switches the policy to "drop". The dropped bytes are reported with the next queued block, and the ends of the pipes which have been spilled are queued in memory, so that they are never lost. Must be called with the lock held.
+    def dropSpilled(self):
+        self.policy = "drop"
+        self.dropped += self.spilledBytes
+        for isStderr in self.spilledEnds:
+            self.blocks.append((None, isStderr, self.dropped))
+            self.dropped = 0
+        self.spilledBytes = 0
+        self.spilledEnds = []
+        self.spillReadPosition = self.spillWritePosition = 0
+        if self.spillFile is not None:
+            try:
+                self.spillFile.close()
+            except OSError:
+                pass
+            self.spillFile = None
+
+    # Returns the standard error output flag and the length of the oldest spilled block without reading it. The dropped bytes are always 0, as the blocks are never dropped and spilled by the same queue. Must be called with the lock held.
+    def peekSpilled(self):
+        self.spillFile.seek(self.spillReadPosition)
+        isStderr, length = OutputQueue.SPILL_HEADER.unpack(
+            self.spillFile.read(OutputQueue.SPILL_HEADER.size)
+        )
+        return isStderr, length, 0
+
+    # Reads the oldest spilled block and returns it with its standard error output flag and 0 dropped bytes. The file is emptied when all the spilled blocks have been read. Must be called with the lock held.
+    def unspill(self):
+        isStderr, length, dropped = self.peekSpilled()
+        block = None if length < 0 else self.spillFile.read(length)
+        self.spillReadPosition = self.spillFile.tell()
+        if block is None:
+            self.spilledEnds.pop(0)
+        else:
+            self.spilledBytes -= length
+        if self.spillReadPosition >= self.spillWritePosition:
+            self.spillFile.truncate(0)
+            self.spillReadPosition = self.spillWritePosition = 0
+        return block, isStderr, dropped
+
+    # Returns True if there is a queued block. Must be called with the lock held.
+    def hasBlock(self):
+        return self.blocks or self.spillReadPosition < self.spillWritePosition
+
+    # Returns the standard error output flag, the length, which is -1 for the end of a pipe, and the number of the bytes dropped before the oldest queued block. Must be called with the lock held.
+    def peek(self):
+        if self.blocks:
+            block, isStderr, dropped = self.blocks[0]
+            return isStderr, -1 if block is None else len(block), dropped
+        return self.peekSpilled()
+
+    # Removes the oldest queued block and returns it with its standard error output flag and the number of the bytes dropped before it. Must be called with the lock held.
+    def take(self):
+        if not self.blocks:
+            return self.unspill()
+        block, isStderr, dropped = self.blocks.popleft()
+        if block is not None:
+            self.size -= len(block)
+        return block, isStderr, dropped
+
+    # Removes the oldest queued block and returns it with its standard error output flag and the number of the bytes dropped before it, or returns None and unschedules the queue if it is empty. The following blocks of the same pipe with no bytes dropped before them are joined to the block up to JOIN_SIZE bytes, so that a backlog of small blocks is processed in large blocks. If the spill file cannot be read, the spilled blocks are dropped, see the dropSpilled method. Called from the consumer thread.
+    def poll(self):
+        resumes = []
+        with self.lock:
+            if not self.hasBlock():
+                self.scheduled = False
+                return None
+            try:
+                block, isStderr, dropped = self.take()
+            except OSError:
+                self.dropSpilled()
+                block, isStderr, dropped = self.take()
+            if block is not None:
+                parts = [block]
+                length = len(block)
+                try:
+                    while length < OutputQueue.JOIN_SIZE and self.hasBlock():
+                        nextIsStderr, nextLength, nextDropped = self.peek()
+                        if nextIsStderr != isStderr or nextLength < 0 or nextDropped:
+                            break
+                        parts.append(self.take()[0])
+                        length += nextLength
+                except OSError:
+                    self.dropSpilled()
+                block = b"".join(parts) if len(parts) > 1 else block
+            if self.resumes and not self.isFull():
+                resumes = self.resumes
+                self.resumes = []
+
+        # Resume the paused pipes outside of the lock, as resuming may wait for the pipe loop
+        for resume in resumes:
+            resume()
+        return block, isStderr, dropped
+
+    # Returns the number of the bytes held in memory and in the spill file.
+    def getSize(self):
+        with self.lock:
+            return self.size, self.spillWritePosition - self.spillReadPosition
+
+    # Reports the given exception raised by processing a block using the onError function. Called from the consumer thread.
+    def reportError(self, error):
+        if self.onError is not None:
+            self.onError(self, error)
+
+    # Removes the spill file, if any.
+    def close(self):
+        with self.lock:
+            if self.spillFile is not None:
+                self.spillFile.close()
+                self.spillFile = None
+                self.spillReadPosition = self.spillWritePosition = 0
+                self.spilledBytes = 0
+                self.spilledEnds = []
+
+
+# Output consumer class. Processes the blocks of all the scheduled output queues in a single thread, so that the number of threads does not grow with the number of processes. The queues take turns, one joined block at a time, so that a process with a large backlog does not hold up the output of the others.
+class OutputConsumer:
+
+    # Shared consumer instance
+    sharedConsumer = None
+
+    # Returns the consumer instance shared by all the output queues, creating it on the first call.
+    @staticmethod
+    def shared():
+        if OutputConsumer.sharedConsumer is None:
+            OutputConsumer.sharedConsumer = OutputConsumer()
+        return OutputConsumer.sharedConsumer
+
+    # Initializes the object. The consumer thread is started when the first queue is scheduled.
+    def __init__(self):
+        self.condition = Condition()
+        self.ready = deque()
+        self.thread = None
+
+    # Schedules the given output queue, which has a queued block, for processing.
+    def schedule(self, queue):
+        with self.condition:
+            if self.thread is None:
+                self.thread = Thread(target=self.run)
+                self.thread.daemon = True  # Thread dies with the program
+                self.thread.start()
+            self.ready.append(queue)
+            self.condition.notify()
+
+    # Processes the blocks of the scheduled queues forever. A queue stays scheduled until it is found empty. An exception raised by processing a block is reported by the queue of the block, so that a failure of one session does not stop the output of the others.
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.ready:
+                    self.condition.wait()
+                queue = self.ready.popleft()
+            try:
+                item = queue.poll()
+                if item is None:
+                    continue
+                queue.onBlock(queue, *item)
+            except Exception as e:
+                try:
+                    queue.reportError(e)
+                except Exception:
+                    # A failing error report must not stop the consumer either
+                    pass
+            with self.condition:
+                self.ready.append(queue)
@@ -0,0 +1,64 @@
+import codecs
+
+# Default maximum number of characters in one line. Longer lines are split into more lines.
+MAX_LINE_LENGTH = 10000
+
+# Process output line decoder class. Decodes blocks of the process output incrementally and splits them into lines. Every line includes its line ending, which is normalized to "\n", except the last line if the output does not end with a new line. Lines longer than the maximum line length are split and every part except the last one gets a "\n" line ending.
+class LineDecoder:
+
+    # Initializes the object for decoding using the given encoding and decoding error policy ("strict", "replace", "ignore", "backslashreplace" etc.). Raises LookupError if the encoding is unknown.
+    def __init__(self, encoding="utf-8", errors="replace", maxLineLength=MAX_LINE_LENGTH):
+        self.encoding = encoding
+        self.decoder = codecs.getincrementaldecoder(encoding)(errors=errors)
+        self.maxLineLength = max(maxLineLength, 1)
+        self.pending = ""
+
+    # Decodes the given block of bytes and returns the list of the lines completed by it.
+    def feed(self, block):
+        return self.split(self.decode(block))
+
+    # Decodes the rest of the output after its end has been reached and returns the list of the remaining lines.
+    def finish(self):
+        lines = self.split(self.decode(b"", True))
+        if self.pending:
+            lines.append(self.pending)
+            self.pending = ""
+        return lines
+
+    # Decodes the given block of bytes, which is the last one if final is True. If the block cannot be decoded using the error policy, e.g., because it is "strict" or unknown, the error policy is switched to "replace", so that the output is never lost. The new decoder continues from the state of the old one, so that an incomplete character buffered from the previous block is not lost.
+    def decode(self, block, final=False):
+        state = self.decoder.getstate()
+        try:
+            return self.decoder.decode(block, final)
+        except (UnicodeDecodeError, LookupError):
+            self.decoder = codecs.getincrementaldecoder(self.encoding)(errors="replace")
+            self.decoder.setstate(state)
+            return self.decoder.decode(block, final)
+
+    # Splits the given decoded text preceded by the pending incomplete line into lines. The incomplete last line is kept pending.
+    def split(self, text):
+        maxLength = self.maxLineLength
+        lines = (self.pending + text).split("\n")
+        pending = lines.pop()
+        result = []
+        for line in lines:
+            self.splitLong(line, result)
+
+        # Do not let a line without a new line grow over the maximum line length. A trailing "\r" is not counted and stays pending, as it may be the start of a "\r\n" line ending split between the blocks
+        while len(pending) - pending.endswith("\r") > maxLength:
+            result.append(pending[:maxLength] + "\n")
+            pending = pending[maxLength:]
+        self.pending = pending
+        return result
+
+    # Adds the given line without its "\n" to the given list with the "\r\n" line ending normalized to "\n" and split into parts not longer than the maximum line length, not counting the line ending.
+    def splitLong(self, content, result):
+        maxLength = self.maxLineLength
+        if content.endswith("\r"):
+            content = content[:-1]
+        if len(content) <= maxLength:
+            result.append(content + "\n")
+            return
+        for start in range(0, len(content), maxLength):
+            result.append(content[start : start + maxLength] + "\n")
+
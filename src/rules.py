@@ -0,0 +1,84 @@
+import re
+
+# Exception raised when a regular expression or replacement of the output line rules is invalid.
+class InvalidRuleError(ValueError):
+
+    # Initializes the object with the settings key of the invalid value and the error message.
+    def __init__(self, key, message):
+        super(InvalidRuleError, self).__init__("{}: {}".format(key, message))
+        self.key = key
+        self.message = message
+
+
+# Output line rules class. Holds the compiled success, error and line substitution regular expressions. The object is never modified after it is created, so the process output reader can use it while a new one is being created and swapped in.
+class Rules:
+
+    # Settings keys the rules are created from.
+    SETTINGS_KEYS = (
+        "playSuccessSound",
+        "successRegex",
+        "playErrorSound",
+        "errorRegex",
+        "lineSubstitution",
+        "substitutionRegex",
+        "substitutionReplacement",
+    )
+
+    __slots__ = ("success", "error", "substitution", "replacement")
+
+    # Initializes the object by compiling the enabled regular expressions from the given settings dictionary. If strict is True, InvalidRuleError is raised for an invalid value, otherwise the invalid rule is disabled.
+    def __init__(self, settings, strict=True):
+        self.success = None
+        self.error = None
+        self.substitution = None
+        self.replacement = settings["substitutionReplacement"]
+        errors = []
+
+        if settings["playSuccessSound"]:
+            self.success = Rules.compile("successRegex", settings, errors)
+        if settings["playErrorSound"]:
+            self.error = Rules.compile("errorRegex", settings, errors)
+        if settings["lineSubstitution"]:
+            self.substitution = Rules.compile("substitutionRegex", settings, errors)
+
+            # Check the back-references in the replacement
+            if self.substitution is not None:
+                try:
+                    self.substitution.sub(self.replacement, "")
+                except (re.error, IndexError) as e:
+                    self.substitution = None
+                    errors.append(InvalidRuleError("substitutionReplacement", str(e)))
+
+        if strict and errors:
+            raise errors[0]
+
+    # Compiles the regular expression under the given key in the given settings dictionary and returns it. If the pattern is invalid, InvalidRuleError is added to the given errors list and None is returned.
+    @staticmethod
+    def compile(key, settings, errors):
+        try:
+            return re.compile(settings[key])
+        except re.error as e:
+            errors.append(InvalidRuleError(key, str(e)))
+            return None
+
+    # Returns True if the given settings dictionary contains a change of any of the rules settings compared to the given current settings dictionary.
+    @staticmethod
+    def areChanged(settings, currentSettings):
+        for key in Rules.SETTINGS_KEYS:
+            if key in settings and settings[key] != currentSettings.get(key):
+                return True
+        return False
+
+    # Returns the given line with the line substitution applied if it is enabled.
+    def substitute(self, line):
+        if self.substitution is None:
+            return line
+        return self.substitution.sub(self.replacement, line)
+
+    # Returns True if the success regular expression is enabled and matches the given line.
+    def isSuccess(self, line):
+        return self.success is not None and self.success.search(line) is not None
+
+    # Returns True if the error regular expression is enabled and matches the given line.
+    def isError(self, line):
+        return self.error is not None and self.error.search(line) is not None
@@ -0,0 +1,382 @@
+from array import array
+import re
+from threading import Event, Thread
+
+from output import LineIndex, OutputBuffer
+
+# Returns the given text converted to lower case without changing its length, so that positions in the converted text are the same as in the original text. Characters whose lower case has a different length are kept as they are.
+def fold(text):
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+    return "".join(
+        char.lower() if len(char.lower()) == 1 else char for char in text
+    )
+
+
+# Returns the compiled regular expression for finding the given text. If useRegex is False, the text is matched literally. Raises re.error if the regular expression is invalid.
+def compilePattern(text, useRegex, ignoreCase):
+    flags = re.IGNORECASE if ignoreCase else 0
+    return re.compile(text if useRegex else re.escape(text), flags)
+
+
+# Approximate number of characters searched at once. Blocks are aligned to line starts, so matches do not cross lines split between blocks. Only a line longer than a block is split, and only when the blocks are iterated forward.
+BLOCK_SIZE = 1024 * 1024
+
+
+# Yields the start position and text of the blocks of the given output buffer covering the given range, extended to whole lines, in the forward or backward order.
+def iterBlocks(output, start, end, backward=False):
+    start = output.getLineStart(output.getLineNumber(start))
+    end = min(end, output.getLength())
+    if start >= end:
+        return
+
+    # Extend the end to the end of its line
+    lastLine = output.getLineNumber(max(end - 1, 0))
+    if lastLine + 1 < output.getLineCount():
+        end = output.getLineStart(lastLine + 1)
+
+    if not backward:
+        blockStart = start
+        while blockStart < end:
+            blockEnd = alignToLine(output, blockStart + BLOCK_SIZE, blockStart, end)
+            yield blockStart, output.getRange(blockStart, blockEnd)
+            blockStart = blockEnd
+    else:
+        blockEnd = end
+        while blockEnd > start:
+            blockStart = alignToLine(
+                output, blockEnd - BLOCK_SIZE, start, blockEnd, backward=True
+            )
+            yield blockStart, output.getRange(blockStart, blockEnd)
+            blockEnd = blockStart
+
+
+# Returns the given position of the given output buffer moved back to the start of its line, if that start lies between the given low and high positions. Positions outside of the range are limited to it. If the position is in the line at the low position, the low position is returned when iterating backward, so that the block is extended to the whole line, while the position is kept when iterating forward, so that a line longer than a block is split.
+def alignToLine(output, position, low, high, backward=False):
+    if position <= low:
+        return low
+    if position >= high:
+        return high
+    lineStart = output.getLineStart(output.getLineNumber(position))
+    if lineStart > low:
+        return lineStart
+    return low if backward else position
+
+
+# Output search index class. Maintains the lower case shadow copy of the command output as the output is appended, so that finding a text neither copies nor converts the whole output. Positions are mapped to the output textbox using the line index of the output buffer, taking into account the output which has been removed from the beginning of the textbox.
+class SearchIndex:
+
+    # Initializes the object for the given output buffer. The given new line length is the number of positions a new line takes in the output textbox, i.e., 2 on Windows where the textbox uses "\r\n" line endings. The given memory limit is used for the shadow copy.
+    def __init__(self, output, newlineLength=1, memoryLimit=None):
+        self.output = output
+        self.newlineLength = newlineLength
+        self.folded = OutputBuffer(memoryLimit=memoryLimit, indexLines=False)
+        self.widgetStart = 0
+
+    # Removes all the indexed text.
+    def clear(self):
+        self.folded.clear()
+        self.widgetStart = 0
+
+    # Sets the maximum number of characters of the shadow copy kept in memory, or no limit if None.
+    def setMemoryLimit(self, memoryLimit):
+        self.folded.setMemoryLimit(memoryLimit)
+
+    # Sets the output position of the line which is at the beginning of the output textbox.
+    def setWidgetStart(self, position):
+        self.widgetStart = position
+
+    # Indexes the given text which has been appended to the output buffer.
+    def append(self, text):
+        self.folded.append(fold(text))
+
+    # Returns the position of the first occurrence of the given text starting at the given position or later and ending before the given end position, or -1 if it is not found. Only the indexed output is searched.
+    def find(self, text, start, ignoreCase, end=None):
+        length = self.folded.getLength()
+        end = length if end is None else min(end, length)
+        if ignoreCase:
+            return self.folded.find(fold(text), start, end)
+        return self.output.find(text, start, end)
+
+    # Returns the position of the last occurrence of the given text starting at the given start position or later and ending before the given position, or -1 if it is not found. Only the indexed output is searched.
+    def rfind(self, text, end, ignoreCase, start=0):
+        end = min(end, self.folded.getLength())
+        if ignoreCase:
+            return self.folded.rfind(fold(text), start, end)
+        return self.output.rfind(text, start, end)
+
+    # Converts the given output position to the position in the output textbox. The result is negative for the output which has been removed from the textbox.
+    def toWidgetPosition(self, position):
+        extra = self.newlineLength - 1
+        lines = self.output.getLineNumber(position) - self.getWidgetStartLine()
+        return position - self.widgetStart + extra * lines
+
+    # Converts the given position in the output textbox to the output position.
+    def toPosition(self, widgetPosition):
+        extra = self.newlineLength - 1
+        if extra == 0:
+            return self.widgetStart + widgetPosition
+
+        # Find the last line starting at or before the widget position
+        startLine = self.getWidgetStartLine()
+        low = startLine
+        high = self.output.getLineCount()
+        while low + 1 < high:
+            middle = (low + high) // 2
+            lineStart = self.output.getLineStart(middle) - self.widgetStart
+            if lineStart + extra * (middle - startLine) <= widgetPosition:
+                low = middle
+            else:
+                high = middle
+        return self.widgetStart + widgetPosition - extra * (low - startLine)
+
+    # Returns the zero based number of the line at the beginning of the output textbox.
+    def getWidgetStartLine(self):
+        return self.output.getLineNumber(self.widgetStart)
+
+
+# Output line filter class. Holds the numbers of the output lines matching a text or a regular expression and read from the given output stream in a compact array. The lines are filtered incrementally, i.e., only the complete lines appended since the last update are matched. Literal texts are found without the regular expression engine, which is much faster when ignoring case.
+class LineFilter:
+
+    # Initializes the object for filtering the given output buffer by the given text and stream, which is "all", "stdout" for the lines not flagged as the standard error output or "stderr" for the flagged ones. If useRegex is False, the text is matched literally. Raises re.error if the regular expression is invalid.
+    def __init__(self, output, text, useRegex, ignoreCase, stream="all"):
+        self.output = output
+        self.key = (text, useRegex, ignoreCase, stream)
+        self.stream = None if stream not in ("stdout", "stderr") else stream == "stderr"
+        self.pattern = compilePattern(text, useRegex, ignoreCase)
+        self.text = None if useRegex else (fold(text) if ignoreCase else text)
+        self.ignoreCase = ignoreCase
+        self.lines = array("q")
+        self.end = 0
+
+    # Returns a new empty line filter for the same output buffer and text.
+    def copy(self):
+        return LineFilter(self.output, *self.key)
+
+    # Returns the number of the matching lines.
+    def getCount(self):
+        return len(self.lines)
+
+    # Returns the output line number of the matching line with the given zero based index.
+    def getLineNumber(self, index):
+        return self.lines[index]
+
+    # Filters the complete lines appended before the given end position since the last update and returns the text of the matching lines, including their line endings. Returns None if the given search job is cancelled.
+    def update(self, end, job=None):
+        output = self.output
+        end = output.getLineStart(output.getLineNumber(end))
+        if end <= self.end:
+            return ""
+        texts = []
+        for blockStart, block in iterBlocks(output, self.end, end):
+            if job is not None and job.isCancelled():
+                return None
+            self.filterBlock(blockStart, block, texts)
+        self.end = end
+        return "".join(texts)
+
+    # Adds the lines of the given block starting at the given output position which match the filter, and adds their text to the given list. The block consists of whole lines, except for a line longer than a block, which is split between the blocks. Such a line is added only once and with its whole text.
+    def filterBlock(self, blockStart, block, texts):
+        output = self.output
+        if self.text is not None:
+            haystack = fold(block) if self.ignoreCase else block
+            text = self.text
+        else:
+            search = self.pattern.search
+        position = 0
+        while position < len(block):
+            if self.text is not None:
+                start = haystack.find(text, position)
+            else:
+                match = search(block, position)
+                start = -1 if match is None else match.start()
+            if start < 0:
+                break
+            lineStart = block.rfind("\n", 0, start) + 1
+            lineEnd = block.find("\n", start)
+            lineEnd = len(block) if lineEnd < 0 else lineEnd + 1
+            position = lineEnd
+            number = output.getLineNumber(blockStart + lineStart)
+            if self.lines and self.lines[-1] == number:
+                # The line has already been added from the previous block
+                continue
+            if self.stream is not None and self.stream != bool(
+                output.getLineFlags(number) & LineIndex.STDERR
+            ):
+                continue
+            self.lines.append(number)
+            if (
+                lineStart == 0 and output.getLineStart(number) < blockStart
+            ) or not block.endswith("\n", 0, lineEnd):
+                texts.append(output.getLine(number) + "\n")
+            else:
+                texts.append(block[lineStart:lineEnd])
+
+
+# Background search job class. Holds the cancellation state of one search started by the Searcher.
+class SearchJob:
+
+    # Initializes the object as not cancelled.
+    def __init__(self):
+        self.cancelled = Event()
+
+    # Cancels the job.
+    def cancel(self):
+        self.cancelled.set()
+
+    # Returns True if the job has been cancelled.
+    def isCancelled(self):
+        return self.cancelled.is_set()
+
+
+# Background output searcher class. Runs regular expression and literal text searches over the output buffer in a worker thread, block by block, so that searching a huge output never blocks the UI. Starting a new search cancels the previous one. The callbacks are called from the worker thread and receive the job, so that results of an outdated job can be ignored.
+class Searcher:
+
+    # Initializes the object for the given output buffer.
+    def __init__(self, output):
+        self.output = output
+        self.job = None
+
+    # Cancels the currently running search, if any.
+    def cancel(self):
+        if self.job is not None:
+            self.job.cancel()
+            self.job = None
+
+    # Starts the given target function with the given arguments in a new worker thread as a new job and returns the job.
+    def start(self, target, *args):
+        self.cancel()
+        self.job = SearchJob()
+        thread = Thread(target=target, args=(self.job,) + args)
+        thread.daemon = True  # Thread dies with the program
+        thread.start()
+        return self.job
+
+    # Starts finding all the matches of the given compiled pattern before the given end position. The onHits function is called with the job and the list of the positions found in every block, and the onDone function with the job and the total number of matches.
+    def findAll(self, pattern, end, onHits, onDone):
+        return self.start(self.runFindAll, pattern, end, onHits, onDone)
+
+    # Starts finding the next match of the given compiled pattern after the given position, or the previous match before it if backward is True. Only the output before the given end position is searched. When nothing is found, the search wraps around the output. The onDone function is called with the job, the found position or -1, and True if the search wrapped.
+    def findNext(self, pattern, position, backward, end, onDone):
+        return self.start(
+            self.runFindNext,
+            self.findFirst,
+            self.findLast,
+            pattern,
+            position,
+            backward,
+            end,
+            onDone,
+        )
+
+    # Starts finding the next occurrence of the given literal text using the given search index, optionally ignoring case, in the same way as the findNext method, so that the output is neither copied nor converted.
+    def findTextNext(self, search, text, ignoreCase, position, backward, end, onDone):
+        return self.start(
+            self.runFindNext,
+            self.findFirstText,
+            self.findLastText,
+            (search, text, ignoreCase),
+            position,
+            backward,
+            end,
+            onDone,
+        )
+
+    # Starts filtering the output before the given end position by the given line filter. The onDone function is called with the job and the text of the newly matching lines.
+    def filter(self, lineFilter, end, onDone):
+        return self.start(self.runFilter, lineFilter, end, onDone)
+
+    # Filters the output by the given line filter. Runs in the worker thread.
+    def runFilter(self, job, lineFilter, end, onDone):
+        text = lineFilter.update(end, job)
+        if text is not None and not job.isCancelled():
+            onDone(job, text)
+
+    # Finds all the matches of the given pattern. Runs in the worker thread.
+    def runFindAll(self, job, pattern, end, onHits, onDone):
+        count = 0
+        for blockStart, block in iterBlocks(self.output, 0, end):
+            if job.isCancelled():
+                return
+            hits = [
+                blockStart + match.start()
+                for match in pattern.finditer(block)
+                if blockStart + match.start() < end
+            ]
+            if hits:
+                count += len(hits)
+                onHits(job, hits)
+        if not job.isCancelled():
+            onDone(job, count)
+
+    # Finds the next or previous match of the given pattern using the given functions finding the first and the last match in a range. Runs in the worker thread.
+    def runFindNext(
+        self, job, findFirst, findLast, pattern, position, backward, end, onDone
+    ):
+        length = min(end, self.output.getLength())
+        wrapped = False
+        if not backward:
+            found = findFirst(job, pattern, position + 1, length)
+            if found < 0:
+                wrapped = True
+                found = findFirst(job, pattern, 0, length)
+        else:
+            found = findLast(job, pattern, 0, position)
+            if found < 0:
+                wrapped = True
+                found = findLast(job, pattern, 0, length)
+        if not job.isCancelled():
+            onDone(job, found, wrapped)
+
+    # Returns the position of the first match of the given pattern starting between the given start and end positions, or -1.
+    def findFirst(self, job, pattern, start, end):
+        for blockStart, block in iterBlocks(self.output, start, end):
+            if job.isCancelled():
+                return -1
+            match = pattern.search(block, max(start - blockStart, 0))
+            if match is not None and blockStart + match.start() < end:
+                return blockStart + match.start()
+        return -1
+
+    # Returns the position of the last match of the given pattern starting between the given start and end positions, or -1.
+    def findLast(self, job, pattern, start, end):
+        for blockStart, block in iterBlocks(self.output, start, end, backward=True):
+            if job.isCancelled():
+                return -1
+            found = -1
+            for match in pattern.finditer(block, max(start - blockStart, 0)):
+                if blockStart + match.start() >= end:
+                    break
+                found = blockStart + match.start()
+            if found >= 0:
+                return found
+        return -1
+
+    # Returns the position of the first occurrence of the literal text given by the tuple of the search index, the text and the ignore case flag, which starts between the given start and end positions and ends before the end position, or -1. The text is found in ranges of about a block, so that the output buffer is not locked for the whole search and the search can be cancelled.
+    def findFirstText(self, job, target, start, end):
+        search, text, ignoreCase = target
+        size = max(BLOCK_SIZE, 2 * len(text))
+        for rangeStart in range(start, end, size):
+            if job.isCancelled():
+                return -1
+            found = search.find(
+                text, rangeStart, ignoreCase, min(rangeStart + size + len(text) - 1, end)
+            )
+            if found >= 0:
+                return found
+        return -1
+
+    # Returns the position of the last occurrence of the literal text given by the tuple of the search index, the text and the ignore case flag, which starts between the given start and end positions, or -1. The text is found in ranges of about a block from the end, like in the findFirstText method.
+    def findLastText(self, job, target, start, end):
+        search, text, ignoreCase = target
+        size = max(BLOCK_SIZE, 2 * len(text))
+        rangeEnd = end + len(text) - 1
+        while True:
+            if job.isCancelled():
+                return -1
+            rangeStart = max(rangeEnd - size, start)
+            found = search.rfind(text, rangeEnd, ignoreCase, rangeStart)
+            if found >= 0 or rangeStart <= start:
+                return found
+            rangeEnd = rangeStart + len(text) - 1
@@ -0,0 +1,541 @@
+import codecs
+import locale
+import os
+import shlex
+import signal
+import subprocess
+import time
+from subprocess import Popen, PIPE, STDOUT
+from threading import Event, Lock, Thread
+
+from ioloop import PipeLoop
+from logwriter import LogWriter
+from monitor import ResourceMonitor
+from output import LineIndex, OutputBuffer
+from outputqueue import OutputQueue
+from reader import LineDecoder
+from stats import PipelineStats
+
+# The psutil, asyncio and ctypes modules are imported only where they are needed, i.e., when killing a process, when using the asyncio backend and when setting the console code page, so that they do not slow down the application start.
+
+ON_WINDOWS = os.name == "nt"
+
+# Process creation flags. On Windows every command gets its own process group, so that Ctrl+Break can be sent to its whole process tree.
+CREATION_FLAGS = subprocess.CREATE_NEW_PROCESS_GROUP if ON_WINDOWS else 0
+
+# Number of seconds to wait for the killed processes to end.
+KILL_TIMEOUT = 5
+
+# Number of seconds between the checks whether the termination should be escalated to killing.
+ESCALATION_CHECK_INTERVAL = 0.1
+
+# Sets the code page of the console shared by the started processes on Windows to the given code page, e.g., 65001 for UTF-8, so that the commands write their output in the expected encoding without running "chcp" before every command. The console is allocated and hidden if the application has none. Should be called once on start. Does nothing if the code page is 0 or on other platforms.
+def setConsoleCodePage(codePage):
+    if not ON_WINDOWS or codePage == 0:
+        return
+    import ctypes
+
+    kernel32 = ctypes.windll.kernel32
+    if not kernel32.GetConsoleWindow() and kernel32.AllocConsole():
+        ctypes.windll.user32.ShowWindow(kernel32.GetConsoleWindow(), 0)  # SW_HIDE
+    kernel32.SetConsoleOutputCP(codePage)
+    kernel32.SetConsoleCP(codePage)
+
+
+# Returns the name of the given output encoding, which is the preferred encoding of the system for "locale". Raises LookupError if the encoding is unknown.
+def resolveEncoding(encoding):
+    if encoding == "locale":
+        encoding = locale.getpreferredencoding(False)
+    return codecs.lookup(encoding).name
+
+
+# Returns the given command string split into the program and its arguments for running without the shell. Commands given as lists are returned as they are.
+def splitCommand(command):
+    if not isinstance(command, str):
+        return list(command)
+    if not ON_WINDOWS:
+        return shlex.split(command)
+
+    # Windows command lines keep backslashes, so only the quotes around the arguments are removed
+    return [
+        arg[1:-1] if len(arg) > 1 and arg.startswith('"') and arg.endswith('"') else arg
+        for arg in shlex.split(command, posix=False)
+    ]
+
+
+# Process session class. Runs a command in a new process, reads its output, applies the output line rules and stores the output in the output buffer. The output is read into an output queue and processed by the consumer thread shared by all the sessions, so that slow processing does not slow down the process unless the "backpressurePolicy" setting is "block". More sessions can run at the same time, each with its own output buffer and rules, with their output read by a shared pipe loop. If the process backend is asyncio, the process is managed by the shared asyncio loop instead, see the getBackend method. The session does not depend on the UI, which subscribes to its events instead:
+# * "line": called with the line, the success and error match flags and the standard error output flag for every output line,
+# * "output": called when new text has been appended to the output buffer,
+# * "end": called with the process return code when the process output ends,
+# * "terminate": called with the stage ("terminate" or "kill") and the number of the processes when the process tree is being terminated,
+# * "error": called with the exception when processing the output fails. The rest of the output is still processed.
+# The events are emitted from the consumer, asyncio loop, process exit or termination thread. If the "separateStderr" setting is on, the standard error output is read separately from the standard output, so that its lines are flagged, otherwise it is merged into the standard output.
+class ProcessSession:
+
+    # Initializes the object with the given settings dictionary, output line rules and pipe loop. The shared pipe loop is used if no loop is given. The given log directory is used for the output logs if the "logDirectory" setting is empty.
+    def __init__(self, settings, rules, loop=None, logDirectory=None):
+        self.settings = settings
+        self.logDirectory = logDirectory
+        self.rules = rules
+        self.loop = loop if loop is not None else PipeLoop.shared()
+        self.process = None
+        self.command = ""
+        self.encoding = "utf-8"
+        self.returnCode = None
+        self.outputOn = True
+        self.lock = Lock()
+        self.log = None
+        self.queue = None
+        self.output = OutputBuffer(memoryLimit=settings["scrollbackLimit"])
+        self.escalation = None
+        stats = PipelineStats.shared()
+        self.readStats = stats.get("read")
+        self.decodeStats = stats.get("decode")
+        self.substituteStats = stats.get("substitute")
+        self.matchStats = stats.get("match")
+        self.substituteNs = 0
+        self.matchNs = 0
+        self.timedLines = 0
+        self.monitor = ResourceMonitor(
+            settings["monitorInterval"], settings["monitorSamples"]
+        )
+        self.listeners = {
+            "line": [],
+            "output": [],
+            "end": [],
+            "terminate": [],
+            "error": [],
+        }
+
+    # Subscribes the given callback to the event with the given name.
+    def subscribe(self, event, callback):
+        self.listeners[event].append(callback)
+
+    # Calls the callbacks subscribed to the event with the given name with the given arguments.
+    def emit(self, event, *args):
+        for callback in self.listeners[event]:
+            callback(*args)
+
+    # Sets the output line rules. The rules are swapped atomically, so they can be set while the process is running.
+    def setRules(self, rules):
+        self.rules = rules
+
+    # Sets whether the output lines are appended to the output buffer.
+    def setOutputOn(self, outputOn):
+        self.outputOn = outputOn
+
+    # Returns True if the process is running.
+    def isRunning(self):
+        return self.process is not None
+
+    # Runs the given command in a new process starting in the given working directory and registers its output in the pipe loop, or runs it in the asyncio loop if the asyncio backend is set. The "useShell" parameter indicates if the command should be executed through the shell. The output is decoded using the given encoding, or the "outputEncoding" setting if None. Raises NotADirectoryError or FileNotFoundError if the working directory does not exist and LookupError if the encoding is unknown.
+    def start(self, command, directory, useShell, encoding=None):
+        encoding = resolveEncoding(encoding or self.settings["outputEncoding"])
+        if self.getBackend() == "asyncio":
+            self.startAsync(command, directory, useShell, encoding)
+            return
+
+        process = Popen(
+            command,
+            cwd=directory,
+            shell=useShell,
+            stdout=PIPE,
+            stderr=self.getStderr(),
+            stdin=PIPE,
+            creationflags=CREATION_FLAGS,
+        )
+        self.process = process
+        self.command = command
+        self.encoding = encoding
+        self.returnCode = None
+        self.openLog()
+        self.startMonitor()
+
+        # Read the process output in the pipe loop and process it in the consumer thread
+        pipes = [(process.stdout, False)]
+        if process.stderr is not None:
+            pipes.append((process.stderr, True))
+        queue = self.createQueue(
+            [isStderr for out, isStderr in pipes], lambda: self.endProcess(process)
+        )
+        for out, isStderr in pipes:
+            self.registerPipe(out, isStderr, queue)
+
+    # Returns the process backend set by the "processBackend" setting, i.e., "threads" or "asyncio". The "auto" backend is asyncio on Windows, where the pipes cannot be waited for by the selectors of the pipe loop, so that the pipes are read by the proactor event loop instead of a thread per pipe, and threads elsewhere, where the pipe loop reads all the pipes in one thread at a lower cost.
+    def getBackend(self):
+        backend = self.settings["processBackend"]
+        if backend == "auto":
+            return "asyncio" if ON_WINDOWS else "threads"
+        return backend
+
+    # Returns the stderr argument for creating the process according to the "separateStderr" setting.
+    def getStderr(self):
+        return PIPE if self.settings["separateStderr"] else STDOUT
+
+    # Returns a new output queue for the output of the current command with the size and policy set by the "outputQueueBytes" and "backpressurePolicy" settings. The queued output is processed with a line decoder for each of the pipes given by their standard error output flags, and the given function is called from the consumer thread when all the pipes have ended and their output has been processed.
+    def createQueue(self, pipes, onEnd):
+        decoders = {isStderr: self.createDecoder() for isStderr in pipes}
+        openPipes = set(pipes)
+        self.queue = OutputQueue(
+            self.settings["outputQueueBytes"],
+            self.settings["backpressurePolicy"],
+            lambda *item: self.consume(decoders, openPipes, onEnd, *item),
+            onError=lambda queue, error: self.emit("error", error),
+        )
+        return self.queue
+
+    # Registers the given output pipe in the pipe loop, which passes the read blocks to the given output queue. The isStderr parameter indicates if the pipe is the standard error output. If the queue is full and its policy is "block", the pipe is paused until the queue has room.
+    def registerPipe(self, out, isStderr, queue):
+        self.loop.register(
+            out,
+            lambda block: self.queueBlock(out, block, isStderr, queue),
+            lambda: self.endPipe(out, isStderr, queue),
+        )
+
+    # Adds the given block read from the given pipe to the given output queue. The isStderr parameter indicates if the pipe is the standard error output.
+    def queueBlock(self, out, block, isStderr, queue):
+        self.readStats.add(len(block))
+        queue.put(
+            block,
+            isStderr,
+            lambda: self.loop.pause(out),
+            lambda: self.loop.resume(out),
+        )
+
+    # Closes the given pipe which has ended and adds its end to the given output queue. The isStderr parameter indicates if the pipe is the standard error output.
+    def endPipe(self, out, isStderr, queue):
+        out.close()
+        queue.put(None, isStderr)
+
+    # Runs the given command in a new process using the asyncio backend with its output decoded using the given encoding. The process is started, read and waited for in the asyncio loop thread. If the "processTimeout" setting is not 0, the process and all its child processes are killed after running for that many seconds.
+    def startAsync(self, command, directory, useShell, encoding):
+        from asyncloop import AsyncLoop
+
+        loop = AsyncLoop.shared()
+        process = loop.submit(self.spawnAsync(command, directory, useShell)).result()
+        self.process = process
+        self.command = command
+        self.encoding = encoding
+        self.returnCode = None
+        self.openLog()
+        self.startMonitor()
+        loop.submit(self.superviseAsync(process, self.settings["processTimeout"]))
+
+    # Creates the process for the given command in the asyncio loop and returns it.
+    async def spawnAsync(self, command, directory, useShell):
+        import asyncio
+
+        if useShell:
+            return await asyncio.create_subprocess_shell(
+                command,
+                cwd=directory,
+                stdout=PIPE,
+                stderr=self.getStderr(),
+                stdin=PIPE,
+                creationflags=CREATION_FLAGS,
+            )
+        return await asyncio.create_subprocess_exec(
+            *splitCommand(command),
+            cwd=directory,
+            stdout=PIPE,
+            stderr=self.getStderr(),
+            stdin=PIPE,
+            creationflags=CREATION_FLAGS,
+        )
+
+    # Reads the output of the given process into a new output queue processed by the consumer thread until it ends, terminates the process tree if it runs longer than the given timeout in seconds, and emits the end event when the process exits and its output has been processed.
+    async def superviseAsync(self, process, timeout):
+        import asyncio
+
+        streams = [(process.stdout, False)]
+        if process.stderr is not None:
+            streams.append((process.stderr, True))
+        loop = asyncio.get_running_loop()
+        processed = loop.create_future()
+        queue = self.createQueue(
+            [isStderr for stream, isStderr in streams],
+            lambda: loop.call_soon_threadsafe(processed.set_result, None),
+        )
+        reading = asyncio.ensure_future(self.readAsync(process, streams, queue))
+        try:
+            await asyncio.wait_for(
+                asyncio.shield(reading), timeout if timeout > 0 else None
+            )
+        except asyncio.TimeoutError:
+            # Terminate the process tree outside of the loop, as the termination waits for the processes to end, while the output is still being read
+            await loop.run_in_executor(
+                None,
+                self.terminateTree,
+                process,
+                self.settings["terminateGracePeriod"],
+                Event(),
+            )
+        returnCode = await reading
+        await processed
+        self.setEnded(process, returnCode)
+
+    # Reads the given output streams of the given process into the given output queue until their end and returns the process return code. Every stream is given as a tuple of the stream reader and the standard error output flag.
+    async def readAsync(self, process, streams, queue):
+        import asyncio
+
+        await asyncio.gather(
+            *(self.readStreamAsync(stream, isStderr, queue) for stream, isStderr in streams)
+        )
+        return await process.wait()
+
+    # Reads the given output stream into the given output queue until its end. The isStderr parameter indicates if the stream is the standard error output. If the queue is full and its policy is "block", reading waits until the queue has room.
+    async def readStreamAsync(self, stream, isStderr, queue):
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        resumed = asyncio.Event()
+        resumed.set()
+        while True:
+            await resumed.wait()
+            block = await stream.read(PipeLoop.BLOCK_SIZE)
+            if not block:
+                break
+            self.readStats.add(len(block))
+            queue.put(
+                block,
+                isStderr,
+                resumed.clear,
+                lambda: loop.call_soon_threadsafe(resumed.set),
+            )
+        queue.put(None, isStderr)
+
+    # Starts logging the output of the current command to a new log file if the "logOutput" setting is on. The log of the previous command is closed.
+    def openLog(self):
+        self.closeLog()
+        directory = self.settings["logDirectory"] or self.logDirectory
+        if not self.settings["logOutput"] or not directory:
+            return
+        self.log = LogWriter.create(
+            directory,
+            self.command,
+            self.settings["logMaxBytes"],
+            self.settings["logMaxSeconds"],
+            self.settings["logCompression"],
+        )
+
+    # Starts sampling the resource usage of the current process tree if the "monitorInterval" setting is not 0.
+    def startMonitor(self):
+        interval = self.settings["monitorInterval"]
+        if interval > 0:
+            self.monitor.interval = interval
+            self.monitor.start(self.process.pid)
+
+    # Closes the output log, if any, after its pending output is written.
+    def closeLog(self):
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+
+    # Returns a new line decoder for the process output in the encoding of the current command.
+    def createDecoder(self):
+        return LineDecoder(
+            self.encoding,
+            errors=self.settings["decodeErrors"],
+            maxLineLength=self.settings["maxLineLength"],
+        )
+
+    # Decodes the given block of the process output using the given line decoder and processes its lines. The isStderr parameter indicates if the block has been read from the standard error output.
+    def fetchOutput(self, decoder, block, isStderr=False):
+        start = time.perf_counter_ns()
+        lines = decoder.feed(block)
+        self.decodeStats.add(len(block), time.perf_counter_ns() - start)
+        for line in lines:
+            self.processLine(line, isStderr)
+        self.addLineStats()
+
+    # Adds the substitution and matching times of the lines processed since the last call to the pipeline statistics as one event per stage, so that the statistics are not updated for every line.
+    def addLineStats(self):
+        with self.lock:
+            lines = self.timedLines
+            substituteNs = self.substituteNs
+            matchNs = self.matchNs
+            self.timedLines = self.substituteNs = self.matchNs = 0
+        if lines:
+            self.substituteStats.add(lines, substituteNs)
+            self.matchStats.add(lines, matchNs)
+
+    # Processes the given block from the given output queue, which is None for the end of a pipe, using the line decoder of its pipe from the given decoders by the standard error output flag. A note about the output dropped before the block is added as an output line. When the last of the given open pipes ends, the queue is closed and the given function is called, even if processing the rest of the pipe output fails. Runs in the consumer thread.
+    def consume(self, decoders, openPipes, onEnd, queue, block, isStderr, dropped):
+        if dropped:
+            self.processLine(
+                "[{} bytes of output dropped, the output could not be processed fast enough]\n".format(
+                    dropped
+                ),
+                isStderr,
+            )
+        if block is not None:
+            self.fetchOutput(decoders[isStderr], block, isStderr)
+            return
+
+        # Process the rest of the ended pipe
+        try:
+            for line in decoders[isStderr].finish():
+                self.processLine(line, isStderr)
+            self.addLineStats()
+        finally:
+            openPipes.discard(isStderr)
+            if not openPipes:
+                queue.close()
+                onEnd()
+
+    # Emits the end event when the given process, whose output has been processed, exits. The process is waited for in a new thread if it is still running, so that the consumer thread does not wait.
+    def endProcess(self, process):
+        if process.poll() is None:
+            thread = Thread(target=self.waitForExit, args=(process,))
+            thread.daemon = True  # Thread dies with the program
+            thread.start()
+        else:
+            self.waitForExit(process)
+
+    # Waits for the given process to exit and emits the end event.
+    def waitForExit(self, process):
+        self.setEnded(process, process.wait())
+
+    # Records that the given process has exited with the given return code and emits the end event.
+    def setEnded(self, process, returnCode):
+        if self.process is process or self.process is None:
+            self.process = None
+            self.escalation = None
+            self.returnCode = returnCode
+            self.monitor.stop()
+            self.closeLog()
+        self.emit("end", returnCode)
+
+    # Applies the output line rules to the given line, timing the substitution and matching in the pipeline statistics, writes it to the output log, appends it to the output buffer with its arrival time and flags if the output is on and emits the line and output events. The isStderr parameter indicates if the line has been read from the standard error output.
+    def processLine(self, line, isStderr=False):
+        with self.lock:
+            rules = self.rules
+            start = time.perf_counter_ns()
+            line = rules.substitute(line)
+            substituted = time.perf_counter_ns()
+            isSuccess = rules.isSuccess(line)
+            isError = rules.isError(line)
+            matched = time.perf_counter_ns()
+            self.substituteNs += substituted - start
+            self.matchNs += matched - substituted
+            self.timedLines += 1
+            log = self.log
+            if log is not None:
+                log.write(line)
+            if self.outputOn:
+                flags = (
+                    (LineIndex.STDERR if isStderr else 0)
+                    | (LineIndex.SUCCESS if isSuccess else 0)
+                    | (LineIndex.ERROR if isError else 0)
+                )
+                self.output.append(line, time.time(), flags)
+                self.emit("output")
+            self.emit("line", line, isSuccess, isError, isStderr)
+
+    # Terminates the running process and all its child processes in a new thread, so that the caller does not wait for the processes to end. The whole process tree is asked to end at once, by Ctrl+Break on Windows and SIGTERM elsewhere, and the processes still running after the "terminateGracePeriod" setting seconds are killed. If the tree is already being terminated, the remaining processes are killed immediately.
+    def terminate(self):
+        if self.process is None:
+            return
+        if self.escalation is not None:
+            self.escalation.set()
+            return
+        self.escalation = Event()
+        thread = Thread(
+            target=self.terminateTree,
+            args=(
+                self.process,
+                self.settings["terminateGracePeriod"],
+                self.escalation,
+            ),
+        )
+        thread.daemon = True  # Thread dies with the program
+        thread.start()
+
+    # Kills the running process and all its child processes immediately.
+    def kill(self):
+        if not self.process:
+            return
+        self.monitor.stop()
+        self.killTree(self.process)
+        self.process = None
+
+    # Returns the psutil processes of the process with the given ID and all its child processes, or an empty list if the process does not exist.
+    def getTree(self, pid):
+        import psutil
+
+        try:
+            parent = psutil.Process(pid)
+            return [parent] + parent.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return []
+
+    # Returns True if the given process, a Popen object or an asyncio process, has exited. The process is waited for by its own object, never by psutil, so that its return code is not taken from the asyncio child watcher.
+    def hasExited(self, process):
+        if isinstance(process, Popen):
+            return process.poll() is not None
+        return process.returncode is not None
+
+    # Waits at most the given number of seconds for the given process, a Popen object or an asyncio process, to exit and the given psutil processes of its child processes to end, and returns the child processes still running. Returns earlier when the given escalation event is set.
+    def waitForTree(self, process, children, timeout, escalation=None):
+        import psutil
+
+        deadline = time.monotonic() + timeout
+        while (children or not self.hasExited(process)) and not (
+            escalation is not None and escalation.is_set()
+        ):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            interval = min(remaining, ESCALATION_CHECK_INTERVAL)
+            if children:
+                gone, children = psutil.wait_procs(children, timeout=interval)
+            else:
+                time.sleep(interval)
+        return children
+
+    # Terminates the given process, a Popen object or an asyncio process, and all its child processes, waiting at most the given grace period in seconds for them to end before they are killed. The processes are killed before the end of the grace period when the given escalation event is set. Emits the terminate event with the progress.
+    def terminateTree(self, process, gracePeriod, escalation):
+        processes = self.getTree(process.pid)
+        if not processes:
+            return
+        children = processes[1:]
+        if gracePeriod > 0:
+            self.emit("terminate", "terminate", len(processes))
+            self.signalTree(processes)
+            children = self.waitForTree(process, children, gracePeriod, escalation)
+        alive = children if self.hasExited(process) else processes[:1] + children
+        if alive:
+            self.emit("terminate", "kill", len(alive))
+            self.killProcesses(process, alive)
+
+    # Asks the given processes of a process tree to end, by Ctrl+Break sent to the process group of the tree root on Windows and SIGTERM sent to every process elsewhere.
+    def signalTree(self, processes):
+        import psutil
+
+        if ON_WINDOWS:
+            try:
+                os.kill(processes[0].pid, signal.CTRL_BREAK_EVENT)
+            except OSError:
+                pass
+            return
+        for process in processes:
+            try:
+                process.terminate()
+            except psutil.NoSuchProcess:
+                pass
+
+    # Kills the given process, a Popen object or an asyncio process, and all its child processes immediately.
+    def killTree(self, process):
+        self.killProcesses(process, self.getTree(process.pid))
+
+    # Kills all the given psutil processes of the process tree of the given process, a Popen object or an asyncio process, at once and waits for them to end.
+    def killProcesses(self, process, processes):
+        import psutil
+
+        for child in processes:
+            try:
+                child.kill()
+            except psutil.NoSuchProcess:
+                pass
+        children = [child for child in processes if child.pid != process.pid]
+        self.waitForTree(process, children, KILL_TIMEOUT)
@@ -0,0 +1,69 @@
+import os
+from queue import Full, Queue
+from threading import Thread
+import time
+
+ON_WINDOWS = os.name == "nt"
+
+if ON_WINDOWS:
+    import winsound
+
+# Sound player class. All the sounds are played one after another by a single worker thread. A sound requested again within its cooldown time is ignored and requests exceeding the queue size are dropped, so the playback cost does not depend on how many output lines match.
+class SoundPlayer:
+
+    # Maximum number of sounds waiting to be played.
+    QUEUE_SIZE = 4
+
+    # Initializes the object and starts the worker thread.
+    def __init__(self):
+        self.sounds = {}
+        self.lastPlayTimes = {}
+        self.queue = Queue(SoundPlayer.QUEUE_SIZE)
+
+        thread = Thread(target=self.run)
+        thread.daemon = True  # Thread dies with the program
+        thread.start()
+
+    # Adds the sound at the given path under the given name with the given cooldown in seconds. WAV files are loaded into memory on Windows, so they are not read from the disk again on every play.
+    def addSound(self, name, path, cooldown=0):
+        data = None
+        if ON_WINDOWS and path.lower().endswith(".wav"):
+            with open(path, "rb") as file:
+                data = file.read()
+        self.sounds[name] = (path, data, cooldown)
+        self.lastPlayTimes[name] = None
+
+    # Sets the cooldown in seconds of the sound with the given name.
+    def setCooldown(self, name, cooldown):
+        path, data, oldCooldown = self.sounds[name]
+        self.sounds[name] = (path, data, cooldown)
+
+    # Requests the sound with the given name to be played unless it has been requested within its cooldown time or the queue is full.
+    def play(self, name):
+        path, data, cooldown = self.sounds[name]
+        now = time.monotonic()
+        lastPlayTime = self.lastPlayTimes[name]
+        if lastPlayTime is not None and now - lastPlayTime < cooldown:
+            return
+        try:
+            self.queue.put_nowait(name)
+        except Full:
+            return
+        self.lastPlayTimes[name] = now
+
+    # Plays the requested sounds forever.
+    def run(self):
+        while True:
+            name = self.queue.get()
+            path, data, cooldown = self.sounds[name]
+            try:
+                if data is not None:
+                    winsound.PlaySound(data, winsound.SND_MEMORY)
+                else:
+                    # The playsound module is loaded when a sound is played for the first time, so that it does not slow down the start
+                    from playsound import playsound
+
+                    playsound(path)
+            except Exception:
+                # A sound which cannot be played must not stop the worker
+                pass
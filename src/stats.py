@@ -0,0 +1,100 @@
+import time
+from threading import Lock
+
+# Pipeline stage statistics class. Counts the events of one stage of the output pipeline, e.g., the blocks read from the pipes or the lines matched by the rules, with the processed units, e.g., bytes or lines, and the histogram of the event durations. The histogram buckets are powers of two of microseconds: bucket 0 counts the events shorter than 1 microsecond and bucket N the events taking from 2 ** (N - 1) to 2 ** N microseconds.
+class StageStats:
+
+    # Number of the histogram buckets. The last bucket counts all the longer events.
+    BUCKET_COUNT = 32
+
+    # Initializes the object with the given name of the processed units.
+    def __init__(self, unit):
+        self.unit = unit
+        self.lock = Lock()
+        self.reset()
+
+    # Resets all the counters.
+    def reset(self):
+        self.count = 0
+        self.units = 0
+        self.totalNs = 0
+        self.maxNs = 0
+        self.buckets = [0] * StageStats.BUCKET_COUNT
+
+    # Adds an event which has processed the given number of units and taken the given number of nanoseconds, or only counts it if the duration is None.
+    def add(self, units, elapsedNs=None):
+        with self.lock:
+            self.count += 1
+            self.units += units
+            if elapsedNs is None:
+                return
+            self.totalNs += elapsedNs
+            if elapsedNs > self.maxNs:
+                self.maxNs = elapsedNs
+            self.buckets[
+                min((elapsedNs // 1000).bit_length(), StageStats.BUCKET_COUNT - 1)
+            ] += 1
+
+    # Returns the counters as a dictionary.
+    def toDict(self):
+        with self.lock:
+            buckets = list(self.buckets)
+            while buckets and buckets[-1] == 0:
+                buckets.pop()
+            return {
+                "count": self.count,
+                "unit": self.unit,
+                "units": self.units,
+                "totalNs": self.totalNs,
+                "maxNs": self.maxNs,
+                "buckets": buckets,
+            }
+
+
+# Output pipeline statistics class. Keeps the statistics of the output pipeline stages, so that it can be told which stage falls behind:
+# * "read": the blocks read from the process pipes in bytes, not timed, as reading includes waiting for the process output,
+# * "decode": the blocks decoded and split into lines in bytes,
+# * "substitute": the lines changed by the line substitution rule, added once per read block,
+# * "match": the lines matched by the success and error rules, added once per read block,
+# * "append": the output appended to the output textbox in characters,
+# * "announce": the announcements output via screen reader.
+# The statistics are shared by all the sessions. The stages are timed using time.perf_counter_ns, so that the counters are cheap enough to be always on.
+class PipelineStats:
+
+    # Stage names with their unit names.
+    STAGES = {
+        "read": "bytes",
+        "decode": "bytes",
+        "substitute": "lines",
+        "match": "lines",
+        "append": "characters",
+        "announce": "announcements",
+    }
+
+    # Shared statistics instance
+    sharedStats = None
+
+    # Returns the statistics instance shared by the whole application, creating it on the first call.
+    @staticmethod
+    def shared():
+        if PipelineStats.sharedStats is None:
+            PipelineStats.sharedStats = PipelineStats()
+        return PipelineStats.sharedStats
+
+    # Initializes the object.
+    def __init__(self):
+        self.stages = {
+            name: StageStats(unit) for name, unit in PipelineStats.STAGES.items()
+        }
+        self.startTime = time.monotonic()
+
+    # Returns the statistics of the stage with the given name.
+    def get(self, stage):
+        return self.stages[stage]
+
+    # Returns the statistics of all the stages as a dictionary including the number of seconds they have been collected for.
+    def toDict(self):
+        return {
+            "seconds": time.monotonic() - self.startTime,
+            "stages": {name: stage.toDict() for name, stage in self.stages.items()},
+        }